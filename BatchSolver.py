@@ -0,0 +1,180 @@
+import numpy as np
+from TetrisSolver import TetrisSolver
+from TetrisGameGenerator import generate_boards_and_sequences
+from tetromino_table import get_placement_table, tetrominoes_names
+
+class BatchSolver:
+    # placement slots per piece: up to four rotations times the columns each one fits in
+    max_slots = 40
+
+    def __init__(self, boards, sequences, goal, beam_width=1, chunk_size=1024):
+        self.boards = np.asarray(boards, dtype=bool)
+        self.count, self.height, self.width = self.boards.shape
+        self.sequences = np.array([[tetrominoes_names.index(piece) for piece in sequence] for sequence in sequences], dtype=np.int64)
+        self.goal = goal
+        self.beam_width = beam_width
+        self.chunk_size = chunk_size
+        self.build_slot_tables()
+
+    def build_slot_tables(self):
+        # per piece and slot: whether the slot exists, its rotation and column, the depth of the highest and lowest
+        # cell in every board column (height / -height where the piece does not reach, so those columns never
+        # matter), the piece's height and its four cell offsets
+        pieces = len(tetrominoes_names)
+        self.slot_valid = np.zeros((pieces, self.max_slots), dtype=bool)
+        self.slot_moves = np.zeros((pieces, self.max_slots, 2), dtype=np.int64)
+        self.slot_top = np.full((pieces, self.max_slots, self.width), self.height, dtype=np.int64)
+        self.slot_bottom = np.full((pieces, self.max_slots, self.width), -self.height, dtype=np.int64)
+        self.slot_height = np.zeros((pieces, self.max_slots), dtype=np.int64)
+        self.slot_rows = np.zeros((pieces, self.max_slots, 4), dtype=np.int64)
+        self.slot_cols = np.zeros((pieces, self.max_slots, 4), dtype=np.int64)
+
+        table = get_placement_table(self.width)
+        for piece, name in enumerate(tetrominoes_names):
+            slot = 0
+            for rotation, placements in enumerate(table[name]):
+                for col, placement in enumerate(placements):
+                    self.slot_valid[piece, slot] = True
+                    self.slot_moves[piece, slot] = rotation, col
+                    self.slot_top[piece, slot, col:col + placement.width] = placement.top
+                    self.slot_bottom[piece, slot, col:col + placement.width] = placement.bottom
+                    self.slot_height[piece, slot] = placement.height
+                    self.slot_rows[piece, slot] = [r for r, c in placement.cells]
+                    self.slot_cols[piece, slot] = [c for r, c in placement.cells]
+                    slot += 1
+
+    def column_heights(self, boards):
+        filled = boards.any(axis=-2)
+        return np.where(filled, self.height - boards.argmax(axis=-2), 0)
+
+    def expand(self, boards, lines, index, pieces):
+        # every placement of pieces[i] on boards[i] at once; returns the child boards (n, slots, height, width), the
+        # lines each child has cleared so far, which children are legal and their priority
+        n = len(boards)
+        heights = self.column_heights(boards)
+        landing = (self.height - heights[:, None, :] - self.slot_bottom[pieces]).min(axis=-1) - 1
+        # a piece is only dropped when it spawns above the skyline in every column it covers; placements that would
+        # need to slide under an overhang are left to the exact solver
+        legal = self.slot_valid[pieces] & (landing >= 0)
+        landing = np.where(legal, landing, 0)
+
+        children = np.repeat(boards[:, None], self.max_slots, axis=1)
+        batch = np.arange(n)[:, None, None]
+        slots = np.arange(self.max_slots)[None, :, None]
+        children[batch, slots, landing[..., None] + self.slot_rows[pieces], self.slot_cols[pieces]] |= legal[..., None]
+
+        # only the rows the piece landed in can have filled up, and only children that completed one are rescanned
+        offsets = np.arange(4)
+        piece_rows = np.minimum(landing[..., None] + offsets, self.height - 1)
+        full = children[batch, slots, piece_rows].all(axis=-1) & (offsets < self.slot_height[pieces][..., None])
+        cleared = full.sum(axis=-1)
+        child_heights = np.maximum(heights[:, None, :], self.height - landing[..., None] - self.slot_top[pieces])
+        filled = boards.sum(axis=(-2, -1))[:, None] + 4 - self.width * cleared
+
+        clearing = np.nonzero(cleared)
+        if len(clearing[0]):
+            # full rows are moved to the top and emptied, the rest keep their order
+            order = np.argsort(~children[clearing].all(axis=-1), axis=-1, kind='stable')
+            compacted = np.take_along_axis(children[clearing], order[..., None], axis=-2)
+            compacted &= (np.arange(self.height)[None, :] >= cleared[clearing][:, None])[..., None]
+            children[clearing] = compacted
+            child_heights[clearing] = self.column_heights(compacted)
+
+        legal &= child_heights.max(axis=-1) < self.height
+        child_lines = lines[:, None] + cleared
+
+        aggregate_height = child_heights.sum(axis=-1)
+        holes = aggregate_height - filled
+        bumpiness = np.abs(np.diff(child_heights, axis=-1)).sum(axis=-1)
+        height_weight, lines_weight, holes_weight, bumpiness_weight = TetrisSolver.feature_weights
+        priority = (height_weight * aggregate_height + lines_weight * cleared + holes_weight * holes + bumpiness_weight * bumpiness
+                    - 4 * height_weight * (index + 1) + lines_weight * child_lines)
+        priority = np.where(legal, priority, -np.inf)
+        return children, child_lines, legal, priority
+
+    def run(self):
+        results = []
+        for start in range(0, self.count, self.chunk_size):
+            results.extend(self.run_chunk(self.boards[start:start + self.chunk_size], self.sequences[start:start + self.chunk_size]))
+        return results
+
+    def run_chunk(self, boards, sequences):
+        # beam search over all boards of the chunk in lock-step; with beam_width 1 this is a greedy rollout
+        n, length = sequences.shape
+        width = self.beam_width
+        beam = np.repeat(boards[:, None], width, axis=1)
+        lines = np.zeros((n, width), dtype=np.int64)
+        alive = np.zeros((n, width), dtype=bool)
+        alive[:, 0] = True
+        failed_attempts = np.zeros(n, dtype=np.int64)
+        solved_at = np.full(n, -1, dtype=np.int64)
+        solved_beam = np.zeros(n, dtype=np.int64)
+        parents = np.zeros((length, n, width), dtype=np.int64)
+        slots = np.zeros((length, n, width), dtype=np.int64)
+
+        for index in range(length):
+            active = alive.any(axis=1) & (solved_at < 0)
+            if not active.any():
+                break
+
+            seeds = np.nonzero(active)[0]
+            pieces = np.repeat(sequences[seeds, index], width)
+            children, child_lines, legal, priority = self.expand(
+                beam[seeds].reshape(-1, self.height, self.width), lines[seeds].reshape(-1), index, pieces)
+
+            expanded = alive[seeds].reshape(-1)
+            legal &= expanded[:, None]
+            priority = np.where(legal, priority, -np.inf)
+            rejected = (self.slot_valid[pieces] & ~legal & expanded[:, None]).reshape(len(seeds), -1).sum(axis=1)
+            failed_attempts[seeds] += rejected
+
+            priority = priority.reshape(len(seeds), width * self.max_slots)
+            legal = legal.reshape(len(seeds), width * self.max_slots)
+            child_lines = child_lines.reshape(len(seeds), width * self.max_slots)
+            children = children.reshape(len(seeds), width * self.max_slots, self.height, self.width)
+
+            # a child that reaches the goal wins outright, the best one if there are several
+            goal_priority = np.where(legal & (child_lines >= self.goal), priority, -np.inf)
+            winners = np.isfinite(goal_priority).any(axis=1)
+            best = np.argsort(-priority, axis=1, kind='stable')[:, :width]
+            best[winners, 0] = goal_priority[winners].argmax(axis=1)
+
+            rows = np.arange(len(seeds))[:, None]
+            parents[index, seeds] = best // self.max_slots
+            slots[index, seeds] = best % self.max_slots
+            beam[seeds] = children[rows, best]
+            lines[seeds] = child_lines[rows, best]
+            alive[seeds] = legal[rows, best]
+
+            solved_at[seeds[winners]] = index
+            solved_beam[seeds[winners]] = 0
+
+        results = []
+        for seed in range(n):
+            if solved_at[seed] < 0:
+                results.append((False, [], int(failed_attempts[seed])))
+                continue
+
+            stack = []
+            member = solved_beam[seed]
+            for index in range(solved_at[seed], -1, -1):
+                piece = sequences[seed, index]
+                rotation, col = self.slot_moves[piece, slots[index, seed, member]]
+                stack.append((tetrominoes_names[piece], int(rotation), int(col)))
+                member = parents[index, seed, member]
+            stack.reverse()
+            results.append((True, stack, int(failed_attempts[seed])))
+
+        return results
+
+
+def solve_games(games, beam_width=1, chunk_size=1024):
+    # games must share their board size, sequence length and goal
+    solver = BatchSolver([game.board for game in games], [game.sequence for game in games], games[0].goal,
+                         beam_width=beam_width, chunk_size=chunk_size)
+    return solver.run()
+
+
+def screen_seeds(seeds, goal, tetrominoes, initial_height_max, beam_width=1, chunk_size=1024):
+    boards, sequences = generate_boards_and_sequences(seeds, tetrominoes, initial_height_max)
+    return BatchSolver(boards, sequences, goal, beam_width=beam_width, chunk_size=chunk_size).run()
@@ -0,0 +1,142 @@
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+import logging
+import os
+import threading
+import hashlib
+import json
+import traceback
+
+class Job:
+    def __init__(self, job_id, total_seeds, params):
+        self.id = job_id
+        self.total_seeds = total_seeds
+        self.params = params
+        self.status = 'queued'
+        self.error = None
+        self.seeds_done = 0
+        self.winners = 0
+        # winning seeds in the order they were found, for clients following the job
+        self.found = []
+        self.submitted = time()
+        self.started = None
+        self.finished = None
+        self.cancel = threading.Event()
+        self.future = None
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+
+    def progress(self, seed, result, seeds_done, winners):
+        with self.changed:
+            self.seeds_done = seeds_done
+            self.winners = winners
+            if result:
+                self.found.append(seed)
+                self.changed.notify_all()
+
+    def set_status(self, status, error=None):
+        with self.changed:
+            self.status = status
+            self.error = error
+            if status != 'running':
+                self.finished = time()
+            self.changed.notify_all()
+
+    def done(self):
+        return self.status not in ('queued', 'running')
+
+    def wait(self, seen, timeout):
+        # blocks until more than `seen` winners have been found, the job ends or timeout passes and returns the
+        # winners after the first `seen`
+        with self.changed:
+            self.changed.wait_for(lambda: len(self.found) > seen or self.done(), timeout)
+            return self.found[seen:]
+
+    def as_dict(self):
+        with self.lock:
+            elapsed = ((self.finished or time()) - self.started) if self.started else 0.0
+            throughput = self.seeds_done / elapsed if elapsed else 0.0
+            eta = (self.total_seeds - self.seeds_done) / throughput if throughput and not self.done() else None
+            return {'id': self.id, 'status': self.status, 'error': self.error, 'params': self.params,
+                    'seeds_done': self.seeds_done, 'total_seeds': self.total_seeds, 'winners': self.winners,
+                    'elapsed': elapsed, 'seeds_per_second': throughput, 'eta': eta}
+
+class JobManager:
+    # every sweep already spreads its seeds over all cores, so by default jobs run one at a time and the rest wait
+    # in submission order, at most max_queued of them if it is set. A job's id and files follow from its key, so the
+    # same sweep submitted again, after a cancel, a failure or a restart of the app, picks up its checkpoint. Jobs
+    # that ended more than retention seconds ago are forgotten and their files deleted
+    def __init__(self, directory='jobs', max_running=1, max_queued=None, retention=7 * 24 * 3600):
+        self.directory = os.path.abspath(directory)
+        self.max_queued = max_queued
+        self.retention = retention
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_running, thread_name_prefix='job')
+
+    def path(self, job_id, extension='csv'):
+        return os.path.join(self.directory, f'{job_id}.{extension}')
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        # a copy, as requests add jobs while others list them
+        with self.lock:
+            return list(self.jobs.values())
+
+    def submit(self, function, total_seeds, params, key=None):
+        # function(path, checkpoint_path, records_path, progress, cancel) runs the job; a job writes its own csv,
+        # checkpoint and solution file. key, params by default, identifies the sweep: while a job with the same key
+        # is queued or running that job is returned. Returns None if max_queued jobs are already waiting
+        job_id = hashlib.sha256(json.dumps(params if key is None else key, sort_keys=True).encode()).hexdigest()[:32]
+        with self.lock:
+            self.prune()
+            if job_id in self.jobs and not self.jobs[job_id].done():
+                return self.jobs[job_id]
+            if self.max_queued is not None and sum(queued.status == 'queued' for queued in self.jobs.values()) >= self.max_queued:
+                return None
+            job = Job(job_id, total_seeds, params)
+            self.jobs[job.id] = job
+            job.future = self.executor.submit(self.run, job, function)
+        return job
+
+    def prune(self):
+        # called with the lock held; files are matched to jobs by name, including those left by earlier runs of the app
+        cutoff = time() - self.retention
+        for job_id, job in list(self.jobs.items()):
+            if job.done() and job.finished < cutoff:
+                del self.jobs[job_id]
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.split('.')[0] not in self.jobs and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+
+    def run(self, job, function):
+        if job.cancel.is_set():
+            job.set_status('cancelled')
+            return
+        job.started = time()
+        job.set_status('running')
+        try:
+            # only made once there is a job to write, so importing the app leaves no directory behind
+            os.makedirs(self.directory, exist_ok=True)
+            function(path=self.path(job.id), checkpoint_path=self.path(job.id, 'sqlite'), records_path=self.path(job.id, 'bin'),
+                     progress=job.progress, cancel=job.cancel)
+            job.set_status('cancelled' if job.cancel.is_set() else 'finished')
+        except Exception as e:
+            logging.error(f"Error in job {job.id}: {str(e)}")
+            logging.error(traceback.format_exc())
+            job.set_status('failed', str(e))
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel.set()
+        if job.future.cancel():
+            job.set_status('cancelled')
+        return job
@@ -0,0 +1,38 @@
+import sqlite3
+
+class ResultCache:
+    # a run that solved a seed answers every larger budget, a run that failed answers every smaller one and a failure
+    # that ended before spending its budget ran out of moves to try, so it answers any budget. A failure read back for
+    # a budget below its failed_attempts reports that budget instead: the search would have stopped there, give or take
+    # the few attempts it spends past its budget on the way out
+    reuse = '(solved AND max_attempts <= :max_attempts) OR (NOT solved AND (max_attempts >= :max_attempts OR failed_attempts < max_attempts))'
+
+    def __init__(self, path='results.sqlite'):
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS results (seed INTEGER, goal INTEGER, tetrominoes INTEGER, initial_height_max INTEGER, '
+                                'strategy TEXT, max_attempts INTEGER, solved INTEGER, failed_attempts INTEGER, moves BLOB, seconds REAL, '
+                                'PRIMARY KEY (seed, goal, tetrominoes, initial_height_max, strategy, max_attempts))')
+
+    def close(self):
+        self.connection.close()
+
+    def lookup(self, seed, goal, tetrominoes, initial_height_max, strategy, max_attempts):
+        return self.lookup_range(seed, seed + 1, goal, tetrominoes, initial_height_max, strategy, max_attempts).get(seed)
+
+    def lookup_range(self, first, last, goal, tetrominoes, initial_height_max, strategy, max_attempts):
+        # returns {seed: (seed, result, failed_attempts, packed moves, seconds)} for the seeds in first..last-1 that a
+        # stored run already answers
+        rows = self.connection.execute(
+            f'SELECT seed, solved, CASE WHEN solved THEN failed_attempts ELSE MIN(failed_attempts, :max_attempts) END, moves, seconds FROM results '
+            f'WHERE seed >= :first AND seed < :last AND goal = :goal AND tetrominoes = :tetrominoes AND initial_height_max = :initial_height_max AND strategy = :strategy AND ({self.reuse}) ORDER BY solved',
+            {'first': first, 'last': last, 'goal': goal, 'tetrominoes': tetrominoes, 'initial_height_max': initial_height_max,
+             'strategy': strategy, 'max_attempts': max_attempts})
+        return {seed: (seed, bool(solved), failed_attempts, moves, seconds) for seed, solved, failed_attempts, moves, seconds in rows}
+
+    def store(self, records, goal, tetrominoes, initial_height_max, strategy, max_attempts):
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(seed, goal, tetrominoes, initial_height_max, strategy, max_attempts, result, failed_attempts, moves, seconds)
+                 for seed, result, failed_attempts, moves, seconds in records])
@@ -0,0 +1,136 @@
+from collections import namedtuple
+from bisect import bisect_left
+from tetromino_table import tetrominoes_names
+import mmap
+import os
+import struct
+
+# file header: magic, version, board height and width, pieces per game, goal, initial_height_max, record size
+header = struct.Struct('<4sBBBHHHI')
+magic = b'TSOL'
+# record: seed, failed attempts, number of moves, solved; followed by the board (one bit per cell, row r in bits
+# r*width..), the sequence (3 bits per piece, an index into tetrominoes_names) and one byte per move (rotation in
+# the high nibble, column in the low one; the piece is the sequence's)
+record_header = struct.Struct('<qIHB')
+
+Solution = namedtuple('Solution', ['seed', 'solved', 'failed_attempts', 'board', 'sequence', 'moves'])
+
+def board_size(height, width):
+    return (height * width + 7) // 8
+
+def sequence_size(tetrominoes):
+    return (tetrominoes * 3 + 7) // 8
+
+def record_size(height, width, tetrominoes):
+    return record_header.size + board_size(height, width) + sequence_size(tetrominoes) + tetrominoes
+
+def pack_board(board):
+    width = len(board[0])
+    packed = 0
+    for r, row in enumerate(board):
+        for c, cell in enumerate(row):
+            if cell:
+                packed |= 1 << (r * width + c)
+    return packed.to_bytes(board_size(len(board), width), 'little')
+
+def unpack_board(data, height, width):
+    packed = int.from_bytes(data, 'little')
+    return [[(packed >> (r * width + c)) & 1 for c in range(width)] for r in range(height)]
+
+def pack_sequence(sequence):
+    packed = 0
+    for i, piece in enumerate(sequence):
+        packed |= tetrominoes_names.index(piece) << (3 * i)
+    return packed.to_bytes(sequence_size(len(sequence)), 'little')
+
+def unpack_sequence(data, tetrominoes):
+    packed = int.from_bytes(data, 'little')
+    return [tetrominoes_names[(packed >> (3 * i)) & 7] for i in range(tetrominoes)]
+
+def pack_solution(seed, solved, failed_attempts, board, sequence, packed_moves):
+    # packed_moves as seed_pipeline.pack_moves makes them; the record is padded to a fixed size for its board and
+    # sequence so a file of them can be indexed directly
+    padding = len(sequence) - len(packed_moves)
+    return (record_header.pack(seed, failed_attempts, len(packed_moves), bool(solved)) + pack_board(board) + pack_sequence(sequence)
+            + packed_moves + bytes(padding))
+
+def unpack_solution(data, height, width, tetrominoes, packed_board=False):
+    # with packed_board the board is left as the solver's bitboard int
+    seed, failed_attempts, move_count, solved = record_header.unpack_from(data)
+    offset = record_header.size
+    board = data[offset:offset + board_size(height, width)]
+    board = int.from_bytes(board, 'little') if packed_board else unpack_board(board, height, width)
+    offset += board_size(height, width)
+    sequence = unpack_sequence(data[offset:offset + sequence_size(tetrominoes)], tetrominoes)
+    offset += sequence_size(tetrominoes)
+    moves = [(piece, move >> 4, move & 15) for piece, move in zip(sequence, data[offset:offset + move_count])]
+    return Solution(seed, bool(solved), failed_attempts, board, sequence, moves)
+
+class SolutionWriter:
+    # appends fixed-size records to a solution file, keeping its first `keep` records when it already exists
+    def __init__(self, path, height, width, tetrominoes, goal, initial_height_max, keep=None):
+        self.size = record_size(height, width, tetrominoes)
+        self.header = header.pack(magic, 1, height, width, tetrominoes, goal, initial_height_max, self.size)
+        exists = keep is not None and os.path.exists(path) and os.path.getsize(path) >= header.size
+        self.file = open(path, 'r+b' if exists else 'wb')
+        if exists:
+            if self.file.read(header.size) != self.header:
+                raise ValueError(f"{path} holds records for other parameters")
+            self.file.truncate(header.size + keep * self.size)
+            self.file.seek(0, os.SEEK_END)
+        else:
+            self.file.write(self.header)
+
+    def write(self, record):
+        self.file.write(record)
+
+    def flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+class SolutionFile:
+    # read-only view of a solution file through mmap; records are decoded only when they are read and, as a sweep
+    # writes them in seed order, find() looks a seed up by binary search
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        found, version, self.height, self.width, self.tetrominoes, self.goal, self.initial_height_max, self.size = header.unpack_from(self.map)
+        if found != magic or version != 1:
+            raise ValueError(f"{path} is not a solution file")
+        self.count = (len(self.map) - header.size) // self.size
+
+    def __len__(self):
+        return self.count
+
+    def record(self, index):
+        offset = header.size + index * self.size
+        return self.map[offset:offset + self.size]
+
+    def __getitem__(self, index):
+        if not -self.count <= index < self.count:
+            raise IndexError(index)
+        return unpack_solution(self.record(index % self.count), self.height, self.width, self.tetrominoes)
+
+    def seed(self, index):
+        return record_header.unpack_from(self.map, header.size + index * self.size)[0]
+
+    def find(self, seed):
+        index = bisect_left(range(self.count), seed, key=self.seed)
+        if index < self.count and self.seed(index) == seed:
+            return self[index]
+        return None
+
+    def array(self):
+        # every record as a numpy structured array over the mapped file, without copying
+        import numpy as np
+        dtype = np.dtype([('seed', '<i8'), ('failed_attempts', '<u4'), ('move_count', '<u2'), ('solved', 'u1'),
+                          ('board', 'u1', board_size(self.height, self.width)), ('sequence', 'u1', sequence_size(self.tetrominoes)),
+                          ('moves', 'u1', self.tetrominoes)])
+        return np.frombuffer(self.map, dtype=dtype, count=self.count, offset=header.size)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
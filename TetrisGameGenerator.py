@@ -1,22 +1,21 @@
 import random
 import logging
-from typing import List, Tuple, Dict
+from typing import TYPE_CHECKING, Iterable, List, Tuple, Dict
+from tetromino_table import Placement, get_placement_table, tetromino_shapes, tetrominoes_names
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+if TYPE_CHECKING:
+    import numpy as np
 
 class TetrisGameGenerator:
-    tetromino_shapes = {
-        'I': [[[1, 1, 1, 1]], [[1], [1], [1], [1]]],
-        'J': [[[1, 0, 0], [1, 1, 1]], [[1, 1], [1, 0], [1, 0]], [[1, 1, 1], [0, 0, 1]], [[0, 1], [0, 1], [1, 1]]],
-        'L': [[[0, 0, 1], [1, 1, 1]], [[1, 0], [1, 0], [1, 1]], [[1, 1, 1], [1, 0, 0]], [[1, 1], [0, 1], [0, 1]]],
-        'O': [[[1, 1], [1, 1]]],
-        'S': [[[0, 1, 1], [1, 1, 0]], [[1, 0], [1, 1], [0, 1]]],
-        'T': [[[0, 1, 0], [1, 1, 1]], [[1, 0], [1, 1], [1, 0]], [[1, 1, 1], [0, 1, 0]], [[0, 1], [1, 1], [0, 1]]],
-        'Z': [[[1, 1, 0], [0, 1, 1]], [[0, 1], [1, 1], [1, 0]]]
-    }
-    tetrominoes_names: List[str] = ['I', 'J', 'L', 'O', 'S', 'T', 'Z']
-
-    def __init__(self, height: int = 20, width: int = 10, seed: int = None, goal: int = 15, tetrominoes: int = 40, initial_height_max: int = 7):
+    tetromino_shapes = tetromino_shapes
+    tetrominoes_names: List[str] = tetrominoes_names
+
+    def __init__(self, height: int = 20, width: int = 10, seed: int = None, goal: int = 15, tetrominoes: int = 40, initial_height_max: int = 7,
+                 rng: random.Random = None):
+        # fill_grid stops at the first piece that would stack above initial_height_max, which can only happen below the top
+        if initial_height_max >= height:
+            raise ValueError(f"initial_height_max must be below the board height of {height}")
+
         self.height = height
         self.width = width
         self.seed = seed
@@ -24,78 +23,75 @@ class TetrisGameGenerator:
         self.tetrominoes = tetrominoes
         self.initial_height_max = initial_height_max
         self.board = [[0 for _ in range(self.width)] for _ in range(self.height)]
+        self.column_heights = [0] * self.width
+        self.placements = get_placement_table(self.width)
 
-        random.seed(self.seed)
+        # a private stream per game; random.Random(seed) draws exactly what random.seed(seed) used to give the
+        # shared module generator, so existing seeds keep their boards and sequences
+        self.random = rng if rng is not None else random.Random(self.seed)
         self.fill_grid()
         self.sequence = self.generate_tetromino_sequence(self.tetrominoes)
 
-    @staticmethod
-    def rotate_tetromino(tetromino: List[List[int]], rotation: int) -> List[List[int]]:
-        for _ in range(rotation % 4):
-            tetromino = list(zip(*tetromino[::-1]))
-        return [list(row) for row in tetromino]
-
-    def is_valid_move(self, tetromino: List[List[int]], row: int, col: int) -> bool:
-        shape = tetromino
-        rows, cols = len(shape), len(shape[0])
-
-        if row + rows > self.height or col < 0 or col + cols > self.width:
+    def is_valid_move(self, placement: Placement, row: int) -> bool:
+        if row + placement.height > self.height:
             return False
 
-        return not any(shape[r][c] == 1 and self.board[row+r][col+c] == 1
-                       for r in range(rows) for c in range(cols))
-
-    def place_tetromino(self, tetromino: List[List[int]], row: int, col: int) -> None:
-        shape = tetromino
-        rows, cols = len(shape), len(shape[0])
+        return not any(self.board[row+r][c] == 1 for r, c in placement.cells)
 
-        while row + rows <= self.height and not any(shape[r][c] == 1 and self.board[row+r][col+c] == 1
-                                                    for r in range(rows) for c in range(cols)):
-            row += 1
+    def place_tetromino(self, placement: Placement) -> None:
+        row = self.calculate_placement_height(placement) - 1
+        for r, c in placement.cells:
+            self.board[row+r][c] = 1
+        for i, top in enumerate(placement.top):
+            self.column_heights[placement.col + i] = max(self.column_heights[placement.col + i], self.height - row - top)
 
-        for r in range(rows):
-            for c in range(cols):
-                if shape[r][c] == 1:
-                    self.board[row-1+r][col+c] = 1
+        self.clear_lines(row, placement.height)
 
-        self.clear_lines()
+    def clear_lines(self, row: int = 0, rows: int = None) -> None:
+        # only rows the last piece landed in can have filled up
+        rows = self.height - row if rows is None else rows
+        full = [r for r in range(row, row + rows) if 0 not in self.board[r]]
+        if full:
+            self.board = [[0 for _ in range(self.width)] for _ in full] + [line for r, line in enumerate(self.board) if r not in full]
+            self.column_heights = [next((self.height - r for r in range(self.height) if self.board[r][c]), 0) for c in range(self.width)]
 
-    def clear_lines(self) -> None:
-        self.board = [[0 for _ in range(self.width)] for _ in range(sum(1 for row in self.board if 0 in row))] + \
-                     [row for row in self.board if 0 not in row]
-
-    def calculate_placement_height(self, tetromino: List[List[int]], col: int) -> int:
-        shape = tetromino
-        rows, cols = len(shape), len(shape[0])
+    def calculate_placement_height(self, placement: Placement) -> int:
+        # first row, counted from the top, at which the piece would collide when dropped from row 0
+        height = min(self.height - self.column_heights[placement.col + i] - bottom for i, bottom in enumerate(placement.bottom))
+        if height > 0:
+            return height
 
+        # the piece reaches below the skyline at row 0, it may still sit in a gap under an overhang
         height = 0
-        while height + rows <= self.height and not any(shape[r][c] == 1 and self.board[height+r][col+c] == 1
-                                                       for r in range(rows) for c in range(cols)):
+        while height + placement.height <= self.height and not any(self.board[height+r][c] == 1 for r, c in placement.cells):
             height += 1
 
         return height
 
     def fill_grid(self) -> None:
         while True:
-            tetromino = random.choice(self.tetrominoes_names)
-            rotation = random.randint(0, len(self.tetromino_shapes[tetromino]) - 1)
-            shape = self.rotate_tetromino(self.tetromino_shapes[tetromino][0], rotation)
-            col_to_try = random.randint(0, self.width - len(shape[0]) + 1)
-            if self.is_valid_move(shape, 0, col_to_try):
-                placement_height = self.calculate_placement_height(shape, col_to_try)
-                if self.height + 1 - placement_height <= self.initial_height_max:
-                    self.place_tetromino(shape, 0, col_to_try)
-                else:
-                    break
+            tetromino = self.random.choice(self.tetrominoes_names)
+            rotation = self.random.randint(0, len(self.tetromino_shapes[tetromino]) - 1)
+            placements = self.placements[tetromino][rotation]
+            col_to_try = self.random.randint(0, self.width - placements[0].width + 1)
+            if col_to_try < len(placements):
+                placement = placements[col_to_try]
+                placement_height = self.calculate_placement_height(placement)
+                # a piece that collides at row 0 does not fit and another one is drawn
+                if placement_height > 0:
+                    if self.height + 1 - placement_height <= self.initial_height_max:
+                        self.place_tetromino(placement)
+                    else:
+                        break
 
     def generate_tetromino_sequence(self, max_moves: int = None) -> List[str]:
         bag_size = 7
         sequence = []
 
         while len(sequence) < max_moves:
-            bag = random.sample(self.tetrominoes_names, bag_size)
+            bag = self.random.sample(self.tetrominoes_names, bag_size)
             while any(bag[i] == bag[i + 1] in ['S', 'Z'] for i in range(bag_size - 1)):
-                random.shuffle(bag)
+                self.random.shuffle(bag)
             sequence.extend(bag)
 
         return sequence[:max_moves]
@@ -107,19 +103,24 @@ class TetrisGameGenerator:
     def visualize_board(self) -> str:
         return '\n'.join([' '.join(map(str, row)) for row in self.board])
 
-    def place_tetromino(self, tetromino: List[List[int]], row: int, col: int) -> None:
-        rows, cols = len(tetromino), len(tetromino[0])
-        for r in range(rows):
-            for c in range(cols):
-                if tetromino[r][c] == 1:
-                    self.board[row+r][col+c] = 1
-        self.clear_lines()
-
 def generate_board_and_sequence(seed: int, tetrominoes: int, initial_height_max: int, goal: int = 0) -> Tuple[List[List[int]], List[str]]:
     game = TetrisGameGenerator(seed=seed, goal=goal, tetrominoes=tetrominoes, initial_height_max=initial_height_max)
     return game.board, game.sequence
 
+def generate_games(seeds: Iterable[int], goal: int, tetrominoes: int, initial_height_max: int, height: int = 20, width: int = 10) -> List[TetrisGameGenerator]:
+    return [TetrisGameGenerator(height=height, width=width, seed=seed, goal=goal, tetrominoes=tetrominoes, initial_height_max=initial_height_max)
+            for seed in seeds]
+
+def generate_boards_and_sequences(seeds: Iterable[int], tetrominoes: int, initial_height_max: int, height: int = 20, width: int = 10) -> Tuple['np.ndarray', List[List[str]]]:
+    # boards stacked as an (n, height, width) array, ready for BatchSolver; numpy is only imported here so the
+    # generator itself loads without it
+    import numpy as np
+    games = generate_games(seeds, 0, tetrominoes, initial_height_max, height, width)
+    boards = np.array([game.board for game in games], dtype=np.uint8).reshape(len(games), height, width)
+    return boards, [game.sequence for game in games]
+
 def main() -> None:
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     game = TetrisGameGenerator(seed=15, goal=15, tetrominoes=40, initial_height_max=7)
     game.print_grid()
     logging.info(f"Sequence: {game.sequence}")
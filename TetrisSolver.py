@@ -1,117 +1,280 @@
-import numpy as np
-from collections import deque
+import heapq
+from collections import OrderedDict, deque
+from itertools import count
+from operator import add, itemgetter, sub
+from time import perf_counter
+from tetromino_table import get_placement_table, tetromino_shapes
+
+class TranspositionTable:
+    # bounded map of search states already known to be dead (or, for a shared memo, their outcome), evicting the
+    # least recently used one
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+        self.misses += 1
+        return None
+
+    def store(self, key, value=True):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+class SolverStats:
+    # opt-in search statistics. attach() wraps the solver's helpers on the instance itself, so a solver created
+    # without stats runs exactly the same code as before
+    timed = ('place_tetromino', 'clear_lines', 'calculate_placement_height', 'scan_placement_height', 'evaluate_columns')
+
+    def __init__(self):
+        self.nodes = 0
+        self.rejected = 0
+        self.game_overs = 0
+        self.backtracks = 0
+        self.max_depth = 0
+        self.seconds = dict.fromkeys(self.timed, 0.0)
+
+    def attach(self, solver):
+        for name in self.timed:
+            setattr(solver, name, self.timer(name, getattr(solver, name)))
+
+        place_tetromino, is_valid_move, is_game_over, restore_state = solver.place_tetromino, solver.is_valid_move, solver.is_game_over, solver.restore_state
+        expand_position = solver.expand_position
+
+        def counted_place_tetromino(placement, row):
+            self.nodes += 1
+            self.max_depth = max(self.max_depth, len(solver.stack) + 1)
+            return place_tetromino(placement, row)
+
+        def counted_expand_position(position):
+            # best-first and beam search keep no stack, the depth of the pieces they place is the index of the piece
+            nodes = self.nodes
+            children = expand_position(position)
+            if self.nodes > nodes:
+                self.max_depth = max(self.max_depth, position[3] + 1)
+            return children
+
+        def counted_is_valid_move(placement, row):
+            valid = is_valid_move(placement, row)
+            self.rejected += not valid
+            return valid
+
+        def counted_is_game_over():
+            game_over = is_game_over()
+            self.game_overs += bool(game_over)
+            return game_over
+
+        def counted_restore_state(state):
+            # restoring the board the solver already has undoes nothing
+            self.backtracks += state[0] != solver.board
+            return restore_state(state)
+
+        solver.place_tetromino = counted_place_tetromino
+        solver.is_valid_move = counted_is_valid_move
+        solver.is_game_over = counted_is_game_over
+        solver.restore_state = counted_restore_state
+        solver.expand_position = counted_expand_position
+
+    def timer(self, name, method):
+        def timed(*args):
+            start = perf_counter()
+            try:
+                return method(*args)
+            finally:
+                self.seconds[name] += perf_counter() - start
+        return timed
+
+    def as_dict(self):
+        # backtracks count the placements the depth-first strategies undo; best-first and beam search jump between
+        # stored positions instead of undoing moves, so theirs stay 0
+        return {'nodes': self.nodes, 'rejected': self.rejected, 'game_overs': self.game_overs, 'backtracks': self.backtracks,
+                'max_depth': self.max_depth, 'seconds': dict(self.seconds)}
+
+    def merge(self, stats):
+        # adds the as_dict() of another run, e.g. one returned by a pool worker
+        self.nodes += stats['nodes']
+        self.rejected += stats['rejected']
+        self.game_overs += stats['game_overs']
+        self.backtracks += stats['backtracks']
+        self.max_depth = max(self.max_depth, stats['max_depth'])
+        for name, seconds in stats['seconds'].items():
+            self.seconds[name] += seconds
 
 class TetrisSolver:
-    tetromino_shapes = {
-        'I': [[[1, 1, 1, 1]], [[1], [1], [1], [1]]],
-        'J': [[[1, 0, 0], [1, 1, 1]], [[1, 1], [1, 0], [1, 0]], [[1, 1, 1], [0, 0, 1]], [[0, 1], [0, 1], [1, 1]]],
-        'L': [[[0, 0, 1], [1, 1, 1]], [[1, 0], [1, 0], [1, 1]], [[1, 1, 1], [1, 0, 0]], [[1, 1], [0, 1], [0, 1]]],
-        'O': [[[1, 1], [1, 1]]],
-        'S': [[[0, 1, 1], [1, 1, 0]], [[1, 0], [1, 1], [0, 1]]],
-        'T': [[[0, 1, 0], [1, 1, 1]], [[1, 0], [1, 1], [1, 0]], [[1, 1, 1], [0, 1, 0]], [[0, 1], [1, 1], [0, 1]]],
-        'Z': [[[1, 1, 0], [0, 1, 1]], [[0, 1], [1, 1], [1, 0]]]
-    }
+    tetromino_shapes = tetromino_shapes
+    # weights of the classic aggregate height, lines cleared, holes and bumpiness evaluation
+    feature_weights = (-0.510066, 0.760666, -0.35663, -0.184483)
+
 
 
+    def __init__(self, board, sequence, goal, max_attempts=100000, transposition_table_size=0, strategy='dfs', beam_width=8, memo=None, stats=None):
+        if strategy not in self.strategies:
+            raise ValueError(f"Unknown strategy: {strategy}")
 
-    def __init__(self, board, sequence, goal, max_attempts=100000):
-        self.board = np.array(board)
-        self.initial_board = np.array(board)
         self.height = len(board)
         self.width = len(board[0])
+        self.full_row = (1 << self.width) - 1
+        self.placements = get_placement_table(self.width)
+        self.board = self.pack_board(board)
+        self.initial_board = self.board
+        self.column_heights = self.compute_column_heights()
+        self.initial_column_heights = self.column_heights[:]
         self.sequence = deque(sequence)
+        self.pieces = list(sequence)
         self.lines_cleared = 0
         self.stack = []
         self.failed_attempts = 0
         self.goal = goal
         self.max_attempts = max_attempts
+        self.transposition_table = TranspositionTable(transposition_table_size) if transposition_table_size else None
+        self.strategy = strategy
+        self.beam_width = beam_width
+        # a TranspositionTable shared between solvers: (board, lines still needed, pieces still to come) decides a
+        # subtree whatever the seed, so its outcome and the attempts it cost can be reused by every later game
+        self.memo = memo
+        self.suffixes = [''.join(self.pieces[i:]) for i in range(len(self.pieces) + 1)] if memo is not None else None
+        self.stats = stats
+        if stats is not None:
+            stats.attach(self)
 
 
     def reset(self):
-        self.board = np.copy(self.initial_board)
+        self.board = self.initial_board
+        self.column_heights = self.initial_column_heights[:]
         self.lines_cleared = 0
         self.stack = []
         self.failed_attempts = 0
 
+    def pack_board(self, board):
+        packed = 0
+        for r, row in enumerate(board):
+            for c, cell in enumerate(row):
+                if cell:
+                    packed |= 1 << (r * self.width + c)
+        return packed
+
+    def compute_column_heights(self):
+        # column_heights[c] counts rows from the floor up to the highest filled cell of column c
+        column_heights = [0] * self.width
+        seen = 0
+        for row in range(self.height):
+            new = (self.board >> (row * self.width)) & self.full_row & ~seen
+            seen |= new
+            while new:
+                column_heights[(new & -new).bit_length() - 1] = self.height - row
+                new &= new - 1
+            if seen == self.full_row:
+                break
+        return column_heights
+
+    def save_state(self):
+        return self.board, self.column_heights[:]
+
+    def restore_state(self, state):
+        # the saved heights are adopted as they are, so a state can only be restored again
+        # before the next placement
+        self.board, self.column_heights = state
+
+    def unpack_board(self, board=None):
+        if board is None:
+            board = self.board
+
+        return [[(board >> (r * self.width + c)) & 1 for c in range(self.width)] for r in range(self.height)]
+
     def rotate_tetromino(self, tetromino, rotation):
         return tetromino[rotation % len(tetromino)]
 
-    def is_valid_move(self, tetromino, row, col):
-        shape = np.asarray(tetromino)
-        rows, cols = self.get_tetromino_dimensions(shape)
-
-        if (
-            row + rows > self.height or
-            col < 0 or col + cols > self.width
-        ):
+    def is_valid_move(self, placement, row):
+        if row + placement.height > self.height:
             return False
 
-        for r in range(rows):
-            for c in range(cols):
-                if shape[r][c] == 1 and self.board[row+r][col+c] == 1:
-                    return False
-
-        return True
-
-    def get_tetromino_dimensions(self, tetromino):
-        if hasattr(tetromino, 'rows') and hasattr(tetromino, 'cols'):
-            return tetromino.rows, tetromino.cols
-
-        rows, cols = tetromino.shape
-        return rows, cols
-
-
-    def place_tetromino(self, tetromino, row, col):
-        shape = np.asarray(tetromino)
-        rows, cols = shape.shape
+        return not self.board & (placement.mask << (row * self.width))
 
-        while row + rows <= self.height and not np.any(np.add(self.board[row:row+rows, col:col+cols], shape) > 1):
-            row += 1
+    def place_tetromino(self, placement, row):
+        row = self.calculate_placement_height(placement, row) - 1
+        self.board |= placement.mask << (row * self.width)
 
-        np.add(self.board[row-1:row-1+rows, col:col+cols], shape, out=self.board[row-1:row-1+rows, col:col+cols])
+        for c, top in enumerate(placement.top, placement.col):
+            if self.height - row - top > self.column_heights[c]:
+                self.column_heights[c] = self.height - row - top
 
-        self.clear_lines()
+        self.clear_lines(row, placement.height)
 
-    def clear_lines(self):
-        full_rows = np.all(self.board, axis=1)
-        self.lines_cleared += np.sum(full_rows)
+    def clear_lines(self, row=0, rows=None):
+        # only rows the last piece touched can have filled up; they are checked top to bottom so
+        # removing one never moves a row that is still to be checked
+        rows = self.height - row if rows is None else rows
+        cleared = 0
+        for offset in range(row * self.width, (row + rows) * self.width, self.width):
+            if (self.board >> offset) & self.full_row == self.full_row:
+                above = self.board & ((1 << offset) - 1)
+                below = self.board >> (offset + self.width) << (offset + self.width)
+                self.board = below | (above << self.width)
+                cleared += 1
 
-        self.board = np.vstack([np.zeros((np.sum(full_rows), self.width), dtype=int), self.board[~full_rows]])
+        if cleared:
+            self.lines_cleared += cleared
+            self.column_heights = self.compute_column_heights()
 
     def visualize(self, board=None):
-        if board is None:
-            board = self.board
-
-        return '\n'.join([' '.join(map(str, row)) for row in board])
+        return '\n'.join([' '.join(map(str, row)) for row in self.unpack_board(board)])
 
     def is_game_over(self):
-        return any(self.board[0][col] == 1 for col in range(self.width))
-
-    def evaluate_columns(self, tetromino):
-        # before evaluating the columns check if the tetromino can be placed at all meaning that at row there must not be any 1s
-
-        if np.any(tetromino[0] == 1):
-            return 0
-
-
-        columns_to_try = list(range(self.width - len(tetromino[0]) + 1))
-        columns_to_try.sort(key=lambda col: -self.calculate_placement_height(tetromino, col))
-        return columns_to_try
-
-    def calculate_placement_height(self, tetromino, col):
-        shape = np.array(tetromino)
-        rows, cols = shape.shape
-
-        height = 0
-        while height + rows <= self.height and not np.any(self.board[height:height+rows, col:col+cols] + shape > 1):
+        return bool(self.board & self.full_row)
+
+    def evaluate_columns(self, placements):
+        columns = len(placements)
+        if max(self.column_heights) + placements[0].height <= self.height:
+            # the piece spawns above the skyline in every column, so it stops wherever the column height
+            # plus the depth of its lowest cell in that column is largest
+            bottom = placements[0].bottom
+            base = min(bottom)
+            profiles = [self.column_heights[i:i + columns] if depth == base else
+                        [height + depth - base for height in self.column_heights[i:i + columns]]
+                        for i, depth in enumerate(bottom)]
+            tops = map(max, *profiles) if len(profiles) > 1 else profiles[0]
+            heights = [self.height - base - top for top in tops]
+        else:
+            heights = [self.scan_placement_height(placement) for placement in placements]
+        return sorted(range(columns), key=heights.__getitem__, reverse=True)
+
+    def calculate_placement_height(self, placement, row=0):
+        # the first row at which the piece would collide, read off the column heights when the whole
+        # piece starts above the skyline and scanned on the bitboard otherwise (collisions at the
+        # spawn row, or cells tucked under an overhang)
+        if row == 0:
+            heights = self.column_heights[placement.col:placement.col + placement.width]
+            height = self.height - max(map(add, heights, placement.bottom))
+            if height > 0:
+                return height
+
+        return self.scan_placement_height(placement, row)
+
+    def scan_placement_height(self, placement, row=0):
+        shifted = placement.mask << (row * self.width) if row else placement.mask
+
+        height = row
+        while height + placement.height <= self.height and not self.board & shifted:
             height += 1
+            shifted <<= self.width
 
         return height
 
 
     def solve(self, current=None):
         current = current if current else self.sequence.popleft()
-        shape = self.tetromino_shapes[current]
+        shape = self.placements[current]
 
         for rotation in range(len(shape)):
             columns_to_try = self.evaluate_columns(shape[rotation])[:1]
@@ -120,17 +283,18 @@ class TetrisSolver:
                 if self.failed_attempts >= self.max_attempts:
 
                     return False, self.stack, self.failed_attempts
-                boardcopy = np.copy(self.board)
+                boardcopy = self.save_state()
 
                 current_iteration_lines_cleared = self.lines_cleared
-                if self.is_valid_move(shape[rotation], 0, col):
-                    self.place_tetromino(shape[rotation], 0, col)
+                placement = shape[rotation][col]
+                if self.is_valid_move(placement, 0):
+                    self.place_tetromino(placement, 0)
                 else:
                     self.failed_attempts += 1
                     continue
 
                 if self.is_game_over():
-                    self.board = np.copy(boardcopy)
+                    self.restore_state(boardcopy)
                     self.lines_cleared = current_iteration_lines_cleared
                     self.failed_attempts += 1
                     continue
@@ -141,32 +305,272 @@ class TetrisSolver:
 
                 elif self.sequence:
                     self.stack.append((current, rotation, col))
-                    next_tetromino = self.sequence.popleft()
-                    result, stack, attempts = self.solve(next_tetromino)
-                    if result:
-                        return True, stack, attempts
-                    self.sequence.appendleft(next_tetromino)
+                    # the board, the lines cleared so far and the position in the sequence decide the whole subtree
+                    key = (self.board, self.lines_cleared, len(self.sequence))
+                    memo_key = self.memo_key(len(self.sequence)) if self.memo is not None else None
+                    known = self.memo.lookup(memo_key) if memo_key is not None else None
+                    if known is not None and self.failed_attempts + known[1] < self.max_attempts:
+                        # a subtree that fits in what is left of the budget ends as it did when it was searched, at the
+                        # same cost; one that does not is searched again so the budget runs out where it would have
+                        moves, cost = known
+                        self.failed_attempts += cost
+                        if moves is not None:
+                            self.stack.extend(moves)
+                            return True, self.stack, self.failed_attempts
+                    elif self.transposition_table is None or not self.transposition_table.lookup(key):
+                        depth = len(self.stack)
+                        attempts_before = self.failed_attempts
+                        next_tetromino = self.sequence.popleft()
+                        result, stack, attempts = self.solve(next_tetromino)
+                        if result:
+                            if memo_key is not None:
+                                self.memo.store(memo_key, (tuple(stack[depth:]), attempts - attempts_before))
+                            return True, stack, attempts
+                        self.sequence.appendleft(next_tetromino)
+                        if self.failed_attempts < self.max_attempts:
+                            if self.transposition_table is not None:
+                                self.transposition_table.store(key)
+                            if memo_key is not None:
+                                self.memo.store(memo_key, (None, self.failed_attempts - attempts_before))
                     self.stack.pop()
                     self.lines_cleared = current_iteration_lines_cleared
-                    self.board = np.copy(boardcopy)
+                    self.restore_state(boardcopy)
 
                 else:
-                    self.board = np.copy(boardcopy)
+                    self.restore_state(boardcopy)
                     self.lines_cleared = current_iteration_lines_cleared
                     self.failed_attempts += 1
 
-                if(rotation == len(current) - 1 and col == self.width - len(shape[rotation][0])):
+                if(rotation == len(current) - 1 and col == self.width - placement.width):
                     self.failed_attempts += 1
-                    self.board = np.copy(boardcopy)
+                    self.restore_state(boardcopy)
                     self.lines_cleared = current_iteration_lines_cleared
 
         return False, self.stack, self.failed_attempts
 
+    def solve_iterative(self):
+        # the same search as solve, driven by an explicit stack of frames instead of recursion: each frame is
+        # [index into the sequence, rotation being tried, undo record of the placement its child is exploring]
+        # and the sequence is walked by index, so the solver can be run again without rebuilding it
+        self.reset()
+        frames = [[0, 0, None]]
+
+        while frames:
+            frame = frames[-1]
+            index, rotation, undo = frame
+            current = self.pieces[index]
+            shape = self.placements[current]
+
+            if undo is not None:
+                # the child frame gave up, take the placement back and move on to the next rotation
+                boardcopy, current_iteration_lines_cleared, key, placement, col, memo_key, attempts_before = undo
+                frame[2] = None
+                frame[1] += 1
+                if self.failed_attempts < self.max_attempts:
+                    if key is not None:
+                        self.transposition_table.store(key)
+                    if memo_key is not None:
+                        self.memo.store(memo_key, (None, self.failed_attempts - attempts_before))
+                self.stack.pop()
+                self.lines_cleared = current_iteration_lines_cleared
+                self.restore_state(boardcopy)
+
+                if(rotation == len(current) - 1 and col == self.width - placement.width):
+                    self.failed_attempts += 1
+                continue
+
+            if rotation == len(shape) or self.failed_attempts >= self.max_attempts:
+                frames.pop()
+                continue
+
+            frame[1] += 1
+            col = self.evaluate_columns(shape[rotation])[0]
+            boardcopy = self.save_state()
+
+            current_iteration_lines_cleared = self.lines_cleared
+            placement = shape[rotation][col]
+            if self.is_valid_move(placement, 0):
+                self.place_tetromino(placement, 0)
+            else:
+                self.failed_attempts += 1
+                continue
+
+            if self.is_game_over():
+                self.restore_state(boardcopy)
+                self.lines_cleared = current_iteration_lines_cleared
+                self.failed_attempts += 1
+                continue
+
+            elif self.lines_cleared >= self.goal:
+                self.stack.append((current, rotation, col))
+                if self.memo is not None:
+                    self.remember_solutions(frames)
+                return True, self.stack, self.failed_attempts
+
+            elif index + 1 < len(self.pieces):
+                self.stack.append((current, rotation, col))
+                key = None
+                explore = True
+                memo_key = self.memo_key(len(self.pieces) - index - 1) if self.memo is not None else None
+                known = self.memo.lookup(memo_key) if memo_key is not None else None
+                if known is not None and self.failed_attempts + known[1] < self.max_attempts:
+                    moves, cost = known
+                    self.failed_attempts += cost
+                    if moves is not None:
+                        self.stack.extend(moves)
+                        self.remember_solutions(frames)
+                        return True, self.stack, self.failed_attempts
+                    memo_key = None
+                    explore = False
+                elif self.transposition_table is not None:
+                    key = (self.board, self.lines_cleared, len(self.pieces) - index - 1)
+                    if self.transposition_table.lookup(key):
+                        key = None
+                        explore = False
+                frame[1] -= 1
+                frame[2] = (boardcopy, current_iteration_lines_cleared, key, placement, col, memo_key, self.failed_attempts)
+                if explore:
+                    frames.append([index + 1, 0, None])
+                continue
+
+            else:
+                self.restore_state(boardcopy)
+                self.lines_cleared = current_iteration_lines_cleared
+                self.failed_attempts += 1
+
+            if(rotation == len(current) - 1 and col == self.width - placement.width):
+                self.failed_attempts += 1
+
+        return False, self.stack, self.failed_attempts
+
+    def memo_key(self, remaining):
+        return (self.board, self.width, self.goal - self.lines_cleared, self.suffixes[len(self.pieces) - remaining])
+
+    def remember_solutions(self, frames):
+        # every frame still exploring a child leads to the solution just found; the moves after its own are the
+        # solution of its subtree
+        for index, rotation, undo in frames:
+            if undo is not None and undo[5] is not None:
+                self.memo.store(undo[5], (tuple(self.stack[index + 1:]), self.failed_attempts - undo[6]))
+
+    def evaluate_position(self, lines):
+        # every filled cell sits under its column's top, so the cells under the skyline that are not filled are holes
+        aggregate_height = sum(self.column_heights)
+        holes = aggregate_height - bin(self.board).count('1')
+        bumpiness = sum(map(abs, map(sub, self.column_heights, self.column_heights[1:])))
+        height_weight, lines_weight, holes_weight, bumpiness_weight = self.feature_weights
+        return height_weight * aggregate_height + lines_weight * lines + holes_weight * holes + bumpiness_weight * bumpiness
+
+    def expand_position(self, position):
+        # every placement of the next piece as (priority, child position); a position is
+        # (board, column heights, lines cleared, index of the next piece, moves as a (move, parent moves) chain)
+        board, column_heights, lines_cleared, index, moves = position
+        current = self.pieces[index]
+        height_weight, lines_weight = self.feature_weights[:2]
+        children = []
+
+        for rotation, placements in enumerate(self.placements[current]):
+            for col, placement in enumerate(placements):
+                self.board, self.column_heights, self.lines_cleared = board, list(column_heights), lines_cleared
+                if not self.is_valid_move(placement, 0):
+                    self.failed_attempts += 1
+                    continue
+
+                self.place_tetromino(placement, 0)
+                if self.is_game_over():
+                    self.failed_attempts += 1
+                    continue
+
+                # every piece adds four cells, so the height it adds is credited back to keep deeper positions
+                # comparable with shallow ones, and lines cleared so far count as progress towards the goal
+                priority = (self.evaluate_position(self.lines_cleared - lines_cleared)
+                            - 4 * height_weight * (index + 1) + lines_weight * self.lines_cleared)
+                children.append((priority, (self.board, tuple(self.column_heights), self.lines_cleared, index + 1,
+                                            ((current, rotation, col), moves))))
+
+        return children
+
+    def finish_search(self, position):
+        self.board, column_heights, self.lines_cleared, index, moves = position
+        self.column_heights = list(column_heights)
+        while moves is not None:
+            move, moves = moves
+            self.stack.append(move)
+        self.stack.reverse()
+        # the positions expanded along the solution were not failures
+        self.failed_attempts -= len(self.stack)
+        return True, self.stack, self.failed_attempts
+
+    def solve_best_first(self):
+        # always expands the most promising position found so far; every expanded position and every rejected
+        # placement costs one attempt, and positions reached twice are only queued once
+        self.reset()
+        order = count()
+        root = (self.board, tuple(self.column_heights), 0, 0, None)
+        frontier = [(0, 0, next(order), root)]
+        seen = set()
+
+        while frontier and self.failed_attempts < self.max_attempts:
+            position = heapq.heappop(frontier)[3]
+            self.failed_attempts += 1
+            for priority, child in self.expand_position(position):
+                if child[2] >= self.goal:
+                    return self.finish_search(child)
+                if child[3] == len(self.pieces):
+                    self.failed_attempts += 1
+                elif child[:4] not in seen:
+                    seen.add(child[:4])
+                    heapq.heappush(frontier, (-priority, -child[3], next(order), child))
+
+        self.board, self.lines_cleared = self.initial_board, 0
+        self.column_heights = self.initial_column_heights[:]
+        return False, self.stack, self.failed_attempts
+
+    def solve_beam(self):
+        # keeps the beam_width best positions after every piece, with the same attempt accounting as best-first
+        self.reset()
+        beam = [(self.board, tuple(self.column_heights), 0, 0, None)]
+
+        while beam and self.failed_attempts < self.max_attempts:
+            candidates = {}
+            for position in beam:
+                self.failed_attempts += 1
+                for priority, child in self.expand_position(position):
+                    if child[2] >= self.goal:
+                        return self.finish_search(child)
+                    if child[:3] not in candidates or candidates[child[:3]][0] < priority:
+                        candidates[child[:3]] = (priority, child)
+
+            if beam[0][3] + 1 == len(self.pieces):
+                self.failed_attempts += len(candidates)
+                break
+            beam = [child for priority, child in heapq.nlargest(self.beam_width, candidates.values(), key=itemgetter(0))]
+
+        self.board, self.lines_cleared = self.initial_board, 0
+        self.column_heights = self.initial_column_heights[:]
+        return False, self.stack, self.failed_attempts
+
+    strategies = {
+        'dfs': solve,
+        'iterative': solve_iterative,
+        'best_first': solve_best_first,
+        'beam': solve_beam,
+    }
+
+    def run(self):
+        return self.strategies[self.strategy](self)
+
+    def table_counters(self):
+        if self.transposition_table is None:
+            return 0, 0
+
+        return self.transposition_table.hits, self.transposition_table.misses
+
     def visualize_moves(self, stack):
         self.reset()
         for tetromino, rotation, col in stack:
             initial_lines_cleared = self.lines_cleared
-            self.place_tetromino(self.tetromino_shapes[tetromino][rotation], 0, col)
+            self.place_tetromino(self.placements[tetromino][rotation][col], 0)
             print("Tetromino: ", tetromino, " Rotation: ", rotation, " Column: ", col)
             print("Lines cleared: ", self.lines_cleared - initial_lines_cleared)
             print(self.visualize())
@@ -211,6 +615,7 @@ if __name__ == '__main__' :
     print('Result: ', result)
     print('Stack: ', stack)
     print('Failed attempts: ', failed_attempts)
+    print('Transposition table hits/misses: ', solver.table_counters())
     print('Lines cleared: ', solver.lines_cleared)
 
     solver.visualize_moves(stack)
@@ -0,0 +1,149 @@
+from TetrisSolver import TetrisSolver
+from TetrisGameGenerator import TetrisGameGenerator, generate_games
+from seed_pipeline import stream_results, warm_up
+from time import perf_counter
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+
+# (goal, tetrominoes, initial_height_max, max_attempts) combinations timed by the seeds per second benchmark
+grid = [(4, 20, 2, 200), (6, 30, 2, 2000), (8, 40, 4, 2000)]
+# entry points whose import time in a fresh interpreter is tracked
+startup_modules = ['TetrisSolver', 'TetrisGameGenerator', 'seed_pipeline', 'app', 'main', 'replay', 'distributed']
+# process start times jitter by a few milliseconds from run to run, so a time also has to grow by this many seconds
+# to count as a regression; a heavy import creeping back in costs far more
+time_slack = 0.02
+
+class CountingSolver(TetrisSolver):
+    # counts every placement the search makes; only used for an untimed pass, so the counter does not slow the
+    # solver that is being timed
+    def place_tetromino(self, placement, row):
+        self.nodes = getattr(self, 'nodes', 0) + 1
+        return super().place_tetromino(placement, row)
+
+def best_time(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+    return min(times)
+
+def benchmark_generator(seeds, repeat):
+    seconds = best_time(lambda: generate_games(range(seeds), 8, 40, 4), repeat)
+    return {'generator.boards_per_second': seeds / seconds}
+
+def benchmark_solver(seeds, repeat):
+    games = generate_games(range(seeds), 6, 30, 2)
+    nodes = 0
+    for game in games:
+        solver = CountingSolver(game.board, game.sequence, game.goal, max_attempts=2000)
+        solver.run()
+        nodes += getattr(solver, 'nodes', 0)
+
+    seconds = best_time(lambda: [TetrisSolver(game.board, game.sequence, game.goal, max_attempts=2000).run() for game in games], repeat)
+    return {'solver.nodes_per_second': nodes / seconds}
+
+def benchmark_grid(seeds, repeat):
+    metrics = {}
+    for goal, tetrominoes, initial_height_max, max_attempts in grid:
+        def solve_all():
+            for seed in range(seeds):
+                game = TetrisGameGenerator(seed=seed, goal=goal, tetrominoes=tetrominoes, initial_height_max=initial_height_max)
+                TetrisSolver(game.board, game.sequence, game.goal, max_attempts=max_attempts).run()
+
+        seconds = best_time(solve_all, repeat)
+        metrics[f'grid.{goal}/{tetrominoes}/{initial_height_max}/{max_attempts}.seeds_per_second'] = seeds / seconds
+    return metrics
+
+def benchmark_pool(seeds, repeat, max_workers):
+    # 1, 2, 4, ... workers and max_workers itself
+    metrics = {}
+    for workers in sorted({min(2 ** i, max_workers) for i in range(max_workers.bit_length() + 1)}):
+        seconds = best_time(lambda: list(stream_results(0, seeds, 6, 30, 2, 2000, 'dfs', workers)), repeat)
+        metrics[f'pool.{workers}_workers.seeds_per_second'] = seeds / seconds
+    return metrics
+
+def benchmark_startup(repeat):
+    # seconds to import each entry point in a new interpreter, over the time of one that imports nothing, and to
+    # start a spawned pool worker, which imports the solver modules again
+    directory = os.path.dirname(os.path.abspath(__file__))
+
+    def start(code):
+        subprocess.run([sys.executable, '-c', code], cwd=directory, check=True)
+
+    def spawn_worker():
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            executor.submit(warm_up, 0).result()
+
+    empty = best_time(lambda: start('pass'), repeat)
+    metrics = {f'startup.{module}.seconds': max(best_time(lambda: start(f'import {module}'), repeat) - empty, 0.0) for module in startup_modules}
+    metrics['startup.spawn_worker.seconds'] = best_time(spawn_worker, repeat)
+    return metrics
+
+def format_metric(name, value):
+    return f"{value:.4f}" if name.endswith('.seconds') else f"{value:.1f}"
+
+def compare(metrics, baseline, threshold):
+    # a regression is a rate that drops, or a time (a metric ending in .seconds) that grows, by more than threshold
+    # relative to the baseline, times also by more than time_slack
+    regressions = []
+    for name, value in sorted(metrics.items()):
+        if not baseline.get(name):
+            continue
+        if value > baseline[name] * (1 + threshold) + time_slack if name.endswith('.seconds') else value < baseline[name] * (1 - threshold):
+            regressions.append(f"{name}: {format_metric(name, value)} vs baseline {format_metric(name, baseline[name])} ({value / baseline[name] - 1:+.1%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark board generation, solving and pool throughput.')
+    parser.add_argument('--seeds', type=int, default=200, help='seeds per benchmark')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per benchmark, the fastest one counts')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), help='largest pool size to time')
+    parser.add_argument('--output', default='benchmark.json', help='where to write the results')
+    parser.add_argument('--baseline', default='benchmark_baseline.json', help='results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='allowed slowdown before a metric counts as a regression')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--startup-only', action='store_true', help='only time imports and worker start')
+    args = parser.parse_args()
+
+    metrics = {}
+    # imports are quick and noisy, so they get more runs
+    metrics.update(benchmark_startup(args.repeat * 5))
+    if not args.startup_only:
+        metrics.update(benchmark_generator(args.seeds * 5, args.repeat))
+        metrics.update(benchmark_solver(args.seeds, args.repeat))
+        metrics.update(benchmark_grid(args.seeds, args.repeat))
+        metrics.update(benchmark_pool(args.seeds * 5, args.repeat, args.workers))
+
+    results = {'python': platform.python_version(), 'machine': platform.machine(), 'cpus': multiprocessing.cpu_count(),
+               'seeds': args.seeds, 'metrics': metrics}
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+    for name, value in sorted(metrics.items()):
+        print(f"{name}: {format_metric(name, value)}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+        return 0
+
+    try:
+        with open(args.baseline) as file:
+            baseline = json.load(file)['metrics']
+    except FileNotFoundError:
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create one")
+        return 0
+
+    regressions = compare(metrics, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
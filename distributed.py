@@ -0,0 +1,207 @@
+from seed_pipeline import run_sweep
+from collections import deque
+from multiprocessing.connection import Client, Listener
+from time import sleep, time
+import argparse
+import concurrent.futures
+import itertools
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import traceback
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class Coordinator(concurrent.futures.Executor):
+    # an executor whose tasks are run by worker processes that connect over TCP, on this host or any other. A worker
+    # asks for a task, runs it and reports back on a new connection; a task that is not reported within
+    # lease_timeout seconds is handed to the next worker that asks, and whichever result arrives first is kept.
+    # Task ids carry a random epoch, so a result a worker computed for an earlier coordinator on the same address is
+    # dropped instead of being taken for the task that has its number now. Messages are pickled, so the authkey must
+    # be kept secret from anyone who can reach the port
+    def __init__(self, address, authkey, lease_timeout=120):
+        if not authkey:
+            raise ValueError("an authkey is required")
+        self.listener = Listener(address, authkey=authkey)
+        self.address = self.listener.address
+        self.lease_timeout = lease_timeout
+        self.tasks = {}
+        self.queue = deque()
+        self.leases = {}
+        self.epoch = os.urandom(8).hex()
+        self.ids = itertools.count()
+        self.lock = threading.Lock()
+        self.stopping = False
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = concurrent.futures.Future()
+        with self.lock:
+            task_id = self.epoch, next(self.ids)
+            self.tasks[task_id] = future, fn, args, kwargs
+            self.queue.append(task_id)
+        return future
+
+    def lease(self):
+        with self.lock:
+            now = time()
+            for task_id, deadline in list(self.leases.items()):
+                if deadline < now:
+                    logging.warning(f"Lease on task {task_id[1]} expired, handing it out again")
+                    del self.leases[task_id]
+                    self.queue.appendleft(task_id)
+
+            while self.queue:
+                task_id = self.queue.popleft()
+                if task_id not in self.tasks:
+                    continue
+                future, fn, args, kwargs = self.tasks[task_id]
+                if not future.running() and not future.set_running_or_notify_cancel():
+                    del self.tasks[task_id]
+                    continue
+                self.leases[task_id] = now + self.lease_timeout
+                return 'task', task_id, fn, args, kwargs
+
+            return ('stop',) if self.stopping and not self.tasks else ('wait', 1.0)
+
+    def finish(self, task_id, ok, value):
+        if task_id[0] != self.epoch:
+            logging.warning(f"Dropped a result for task {task_id[1]} of another coordinator")
+            return
+        with self.lock:
+            task = self.tasks.pop(task_id, None)
+            self.leases.pop(task_id, None)
+        if task is None:
+            # a worker whose lease ran out answered after another one
+            return
+        if ok:
+            task[0].set_result(value)
+        else:
+            task[0].set_exception(RuntimeError(value))
+
+    def serve(self):
+        while True:
+            try:
+                connection = self.listener.accept()
+            except multiprocessing.AuthenticationError as e:
+                logging.warning(f"Rejected a connection: {str(e)}")
+                continue
+            except OSError:
+                return
+            threading.Thread(target=self.handle, args=(connection,), daemon=True).start()
+
+    def handle(self, connection):
+        with connection:
+            try:
+                message = connection.recv()
+                if message[0] == 'lease':
+                    connection.send(self.lease())
+                elif message[0] == 'result':
+                    self.finish(*message[1:])
+                    connection.send(('ok',))
+            except (EOFError, OSError) as e:
+                logging.warning(f"Lost a worker connection: {str(e)}")
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        with self.lock:
+            self.stopping = True
+            if cancel_futures:
+                for future, fn, args, kwargs in self.tasks.values():
+                    future.cancel()
+        if wait:
+            concurrent.futures.wait([task[0] for task in list(self.tasks.values())])
+            # long enough for every waiting worker to ask again and be told to stop
+            sleep(2)
+        self.listener.close()
+
+def work(address, authkey, retry=30):
+    # asks the coordinator at address for tasks until it says stop, or cannot be reached for retry seconds
+    name = f'{socket.gethostname()}:{os.getpid()}'
+    last_contact = time()
+    report = None
+    while True:
+        try:
+            with Client(address, authkey=authkey) as connection:
+                if report is not None:
+                    connection.send(('result',) + report)
+                    connection.recv()
+                    report = None
+                    last_contact = time()
+                    continue
+                connection.send(('lease', name))
+                reply = connection.recv()
+        except multiprocessing.AuthenticationError as e:
+            logging.error(f"Worker {name} was refused by the coordinator: {str(e)}")
+            return
+        except (OSError, EOFError):
+            if time() - last_contact > retry:
+                logging.info(f"Worker {name} lost the coordinator, exiting")
+                return
+            sleep(1)
+            continue
+
+        last_contact = time()
+        if reply[0] == 'stop':
+            return
+        if reply[0] == 'wait':
+            sleep(reply[1])
+            continue
+
+        _, task_id, fn, args, kwargs = reply
+        try:
+            report = task_id, True, fn(*args, **kwargs)
+        except Exception as e:
+            logging.error(f"Error in task {task_id[1]}: {str(e)}")
+            logging.error(traceback.format_exc())
+            report = task_id, False, f"{type(e).__name__}: {str(e)}"
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a sweep on worker processes spread over one or more hosts.')
+    parser.add_argument('--host', default='127.0.0.1', help='address the coordinator listens on or the workers connect to')
+    parser.add_argument('--port', type=int, default=6000)
+    parser.add_argument('--authkey', default=os.environ.get('TETRIS_AUTHKEY'), help='shared secret, required; defaults to $TETRIS_AUTHKEY')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    coordinator = commands.add_parser('coordinator', help='hand out the seeds of a sweep and write its winners')
+    for name in ('start', 'end', 'goal', 'tetrominoes', 'initial_height_max', 'max_attempts'):
+        coordinator.add_argument(name, type=int)
+    coordinator.add_argument('--strategy', default='dfs')
+    coordinator.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), help='worker processes expected, sizes the queue of tasks')
+    coordinator.add_argument('--lease-timeout', type=float, default=120, help='seconds before a task is given to another worker')
+    coordinator.add_argument('--path', default='winnable_games.csv')
+    coordinator.add_argument('--checkpoint', default='checkpoint.sqlite')
+    coordinator.add_argument('--cache', default='results.sqlite', help='result cache, empty to disable')
+
+    worker = commands.add_parser('worker', help='solve seeds handed out by a coordinator')
+    worker.add_argument('--processes', type=int, default=multiprocessing.cpu_count())
+    worker.add_argument('--retry', type=float, default=30, help='seconds to keep trying to reach the coordinator')
+    args = parser.parse_args()
+    if not args.authkey:
+        # anyone who knows the key can make the other side unpickle what they send, so there is no built-in one
+        parser.error('set --authkey or $TETRIS_AUTHKEY to a secret shared by the coordinator and its workers')
+    authkey = args.authkey.encode()
+
+    if args.command == 'worker':
+        processes = [multiprocessing.Process(target=work, args=((args.host, args.port), authkey, args.retry)) for _ in range(args.processes)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        return 0
+
+    executor = Coordinator((args.host, args.port), authkey, args.lease_timeout)
+    logging.info(f"Coordinator listening on {executor.address[0]}:{executor.address[1]}")
+    try:
+        total_games, winnable_games = run_sweep(args.start, args.end, args.goal, args.tetrominoes, args.initial_height_max, args.max_attempts,
+                                                args.strategy, args.workers, path=args.path, checkpoint_path=args.checkpoint,
+                                                cache_path=args.cache or None, executor=executor)
+    finally:
+        executor.shutdown()
+    logging.info(f"{winnable_games} of {total_games} games winnable")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,29 +1,45 @@
-from flask import Flask, render_template, request, send_file, jsonify
-from TetrisSolver import TetrisSolver
+from flask import Flask, Response, render_template, request, send_file, jsonify
+from TetrisSolver import TetrisSolver, SolverStats
 from TetrisGameGenerator import TetrisGameGenerator
+from seed_pipeline import run_sweep, pack_moves, unpack_moves, simulate_seed, start_pool
+from SolutionFile import pack_solution
+from ResultCache import ResultCache
+from JobManager import JobManager
+from parallel_search import solve_parallel
+from replay import replay
+from contextlib import closing
+from functools import partial
 from time import time
+import concurrent.futures
 import multiprocessing
-import csv
-import io
+import json
 import logging
-import concurrent.futures
+import os
 import threading
 import traceback
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 app = Flask(__name__)
+# at most max_queued_jobs sweeps wait for the cpus, further ones are turned away
+max_queued_jobs = 8
+jobs = JobManager(max_queued=max_queued_jobs)
 
-def solve_game(args):
-    game, max_moves = args
-    try:
-        solver = TetrisSolver(game.board, game.sequence, game.goal, max_attempts=max_moves)
-        result, moves, failed_attempts = solver.solve()
-        return game if result else None
-    except Exception as e:
-        logging.error(f"Error in solve_game: {str(e)}")
-        logging.error(traceback.format_exc())
-        return None
+# sweeps share one warm process pool with a worker per cpu and keep it busy with queued tasks, so simulations get a
+# small warm pool of their own instead of waiting behind them. At most simulate_slots simulations wait for or run on
+# it at once, further ones are turned away, and a slot is only freed when its solver really finishes
+simulate_timeout = 30
+simulate_workers = max(1, multiprocessing.cpu_count() // 4)
+simulate_slots = threading.BoundedSemaphore(2 * simulate_workers)
+pool_sizes = {'sweep': multiprocessing.cpu_count(), 'simulate': simulate_workers}
+pools = {}
+pool_lock = threading.Lock()
+
+def get_pool(kind='sweep'):
+    with pool_lock:
+        if kind not in pools:
+            pools[kind] = start_pool(pool_sizes[kind])
+        return pools[kind]
 
 def generate_game(args):
     seed, goal, tetrominoes, initial_height_max = args
@@ -34,68 +50,44 @@ def generate_game(args):
         logging.error(traceback.format_exc())
         return None
 
-def run_game_generation_and_solving(start, end, goal, tetrominoes, initial_height_max, max_attempts):
+def run_game_generation_and_solving(start, end, goal, tetrominoes, initial_height_max, max_attempts, strategy='dfs', collect_stats=False, append=True,
+                                     adaptive_sample=0, path='winnable_games.csv', checkpoint_path='checkpoint.sqlite', records_path=None, progress=None,
+                                     cancel=None):
     num_processes = multiprocessing.cpu_count()
     logging.info(f"Number of processes: {num_processes}")
 
     start_loop = time()
-    games = []
-    winnable_games = []
+    stats = SolverStats() if collect_stats else None
 
     try:
-        with concurrent.futures.ProcessPoolExecutor(max_workers=num_processes) as executor:
-            start_game_generation = time()
-            future_to_game = {executor.submit(generate_game, (i, goal, tetrominoes, initial_height_max)): i for i in range(start, end)}
-            for future in concurrent.futures.as_completed(future_to_game):
-                try:
-                    game = future.result()
-                    if game is not None:
-                        games.append(game)
-                    if len(games) % 100 == 0:
-                        logging.info(f"Generated {len(games)} games")
-                except Exception as e:
-                    logging.error(f"Error generating game: {str(e)}")
-                    logging.error(traceback.format_exc())
-            end_game_generation = time()
-            logging.info(f"Time to generate games: {end_game_generation - start_game_generation:.2f} seconds")
-
-            start_game_solving = time()
-            future_to_solve = {executor.submit(solve_game, (game, max_attempts)): game for game in games}
-            for future in concurrent.futures.as_completed(future_to_solve):
-                try:
-                    result = future.result()
-                    if result:
-                        winnable_games.append(result)
-                    if len(winnable_games) % 10 == 0:
-                        logging.info(f"Found {len(winnable_games)} winnable games")
-                except Exception as e:
-                    logging.error(f"Error solving game: {str(e)}")
-                    logging.error(traceback.format_exc())
-            end_game_solving = time()
-            logging.info(f"Time to solve games: {end_game_solving - start_game_solving:.2f} seconds")
-
+        total_games, winnable_games = run_sweep(start, end, goal, tetrominoes, initial_height_max, max_attempts, strategy, num_processes,
+                                                path=path, append=append, checkpoint_path=checkpoint_path, records_path=records_path, stats=stats,
+                                                adaptive_sample=adaptive_sample, progress=progress, cancel=cancel, executor=get_pool())
     except Exception as e:
         logging.error(f"Error in game generation and solving process: {str(e)}")
         logging.error(traceback.format_exc())
+        raise
 
     total_time = time() - start_loop
-    log_results(goal, tetrominoes, max_attempts, total_time, winnable_games, len(games))
+    log_results(goal, tetrominoes, max_attempts, total_time, winnable_games, total_games, strategy, stats)
     return winnable_games
 
-def log_results(goal, tetrominoes, max_attempts, total_time, winnable_games, total_games):
+def log_results(goal, tetrominoes, max_attempts, total_time, winnable_games, total_games, strategy='dfs', stats=None):
     logging.info(f"Total time: {total_time:.2f} seconds")
-    logging.info(f"Number of winnable games: {len(winnable_games)}")
+    logging.info(f"Number of winnable games: {winnable_games}")
 
     with open('log.txt', 'a') as file:
         if winnable_games:
-            avg_time_per_game = total_time / len(winnable_games)
+            avg_time_per_game = total_time / winnable_games
             file.write(f"The average time per winnable game for {goal}/{tetrominoes} goal/tetrominoes was {avg_time_per_game:.2f} seconds. "
-                       f"{len(winnable_games)} games were winnable. It took {total_time:.2f} seconds to pass through all {total_games} seeds "
-                       f"with a max_attempts of {max_attempts}.\n")
+                       f"{winnable_games} games were winnable. It took {total_time:.2f} seconds to pass through all {total_games} seeds "
+                       f"with a max_attempts of {max_attempts} using the {strategy} strategy.\n")
         else:
             file.write(f"No winnable games found for {goal}/{tetrominoes} goal/tetrominoes. "
                        f"It took {total_time:.2f} seconds to pass through all {total_games} seeds "
-                       f"with a max_attempts of {max_attempts}.\n")
+                       f"with a max_attempts of {max_attempts} using the {strategy} strategy.\n")
+        if stats is not None:
+            file.write(f"Solver stats: {json.dumps(stats.as_dict())}\n")
 
 @app.route('/')
 def index():
@@ -109,38 +101,111 @@ def process_games():
     tetrominoes = int(request.form['tetrominoes'])
     initial_height_max = int(request.form['initial_height_max'])
     max_attempts = int(request.form['max_attempts'])
+    strategy = request.form.get('strategy', 'dfs')
+    if strategy not in TetrisSolver.strategies:
+        return jsonify({'error': f'unknown strategy {strategy}'}), 400
+    collect_stats = request.form.get('collect_stats') == 'yes'
+    adaptive_sample = int(request.form.get('adaptive_sample', 0))
 
-    def run_processing():
-        try:
-            logging.info(f"Starting processing with parameters: start={start}, end={end}, goal={goal}, tetrominoes={tetrominoes}, initial_height_max={initial_height_max}, max_attempts={max_attempts}")
-            winnable_games = run_game_generation_and_solving(start, end, goal, tetrominoes, initial_height_max, max_attempts)
-
-            # Create CSV in memory
-            output = io.StringIO()
-            writer = csv.writer(output)
-            writer.writerow(["seed", "max_moves", "goal", "initial_height_max"])
-            for game in winnable_games:
-                writer.writerow([game.seed, game.tetrominoes, game.goal, game.initial_height_max])
-
-            # Save CSV to file
-            output.seek(0)
-            with open('winnable_games.csv', 'w', newline='') as f:
-                f.write(output.getvalue())
-
-            logging.info(f'Processing complete. {len(winnable_games)} winnable games found.')
-        except Exception as e:
-            logging.error(f"Error in run_processing: {str(e)}")
-            logging.error(traceback.format_exc())
-
-    # Start processing in a separate thread
-    thread = threading.Thread(target=run_processing)
-    thread.start()
+    if generate_game((start, goal, tetrominoes, initial_height_max)) is None:
+        return jsonify({'error': 'no game can be generated with these parameters'}), 400
+
+    params = {'start': start, 'end': end, 'goal': goal, 'tetrominoes': tetrominoes, 'initial_height_max': initial_height_max,
+              'max_attempts': max_attempts, 'strategy': strategy, 'collect_stats': collect_stats, 'adaptive_sample': adaptive_sample}
+
+    # the job streams its winners into its own csv; it waits in the queue while another sweep has the cpus. The same
+    # sweep sent again gets the same job, which resumes from its checkpoint if it was cancelled or the app restarted
+    job = jobs.submit(partial(run_game_generation_and_solving, start, end, goal, tetrominoes, initial_height_max, max_attempts, strategy, collect_stats,
+                              append=False, adaptive_sample=adaptive_sample), max(end - start, 0), params,
+                      key={name: value for name, value in params.items() if name != 'collect_stats'})
+    if job is None:
+        return jsonify({'error': 'too many jobs waiting, try again later'}), 503, {'Retry-After': '60'}
+    logging.info(f"Queued job {job.id} with parameters: {params}")
 
     return jsonify({
-        'message': 'Processing started. Check the console for progress updates.',
-        'download_url': '/download_csv'
+        'message': 'Processing queued.',
+        'job_id': job.id,
+        'status_url': f'/jobs/{job.id}',
+        'events_url': f'/jobs/{job.id}/events',
+        'cancel_url': f'/jobs/{job.id}/cancel',
+        'download_url': f'/jobs/{job.id}/csv',
+        'records_url': f'/jobs/{job.id}/records'
     })
 
+@app.route('/jobs')
+def list_jobs():
+    return jsonify([job.as_dict() for job in jobs.list()])
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'unknown job'}), 404
+    return jsonify(job.as_dict())
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    # server-sent events: a `winner` event for every winnable seed as soon as it is solved, a `progress` event with
+    # the job status at most once a second and a final `done` event. With ?limit=n the stream ends after n winners;
+    # the job itself keeps running until it is cancelled
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'unknown job'}), 404
+    limit = request.args.get('limit', type=int)
+
+    def events():
+        seen = 0
+        last_progress = 0
+        while True:
+            winners = job.wait(seen, 1.0)
+            if limit is not None:
+                winners = winners[:limit - seen]
+            for seed in winners:
+                yield f"event: winner\ndata: {json.dumps({'seed': seed})}\n\n"
+            seen += len(winners)
+
+            finished = job.done() or (limit is not None and seen >= limit)
+            if finished or time() - last_progress >= 1.0:
+                yield f"event: progress\ndata: {json.dumps(job.as_dict())}\n\n"
+                last_progress = time()
+            if finished:
+                yield f"event: done\ndata: {json.dumps({'winners': seen})}\n\n"
+                return
+
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'unknown job'}), 404
+    return jsonify(job.as_dict())
+
+@app.route('/jobs/<job_id>/csv')
+def download_job_csv(job_id):
+    job = jobs.get(job_id)
+    if job is None or not os.path.exists(jobs.path(job.id)):
+        return jsonify({'error': 'no results for this job'}), 404
+    return send_file(
+        jobs.path(job.id),
+        mimetype='text/csv',
+        as_attachment=True,
+        download_name='winnable_games.csv'
+    )
+
+@app.route('/jobs/<job_id>/records')
+def download_job_records(job_id):
+    # the job's winners with their boards, sequences and moves, in the format SolutionFile reads
+    job = jobs.get(job_id)
+    if job is None or not os.path.exists(jobs.path(job.id, 'bin')):
+        return jsonify({'error': 'no results for this job'}), 404
+    return send_file(
+        jobs.path(job.id, 'bin'),
+        mimetype='application/octet-stream',
+        as_attachment=True,
+        download_name='winnable_games.bin'
+    )
+
 @app.route('/download_csv')
 def download_csv():
     return send_file(
@@ -157,18 +222,77 @@ def simulate():
     tetrominoes = int(request.form['tetrominoes'])
     initial_height_max = int(request.form['initial_height_max'])
     max_attempts = int(request.form['max_attempts'])
+    transposition_table_size = int(request.form.get('transposition_table_size', 0))
+    strategy = request.form.get('strategy', 'dfs')
+    if strategy not in TetrisSolver.strategies:
+        return jsonify({'error': f'unknown strategy {strategy}'}), 400
+    # only the depth-first strategies are split, the others run on the pool like any other simulation
+    parallel = request.form.get('parallel') == 'yes' and strategy in ('dfs', 'iterative')
+    binary = request.form.get('format') == 'binary'
 
     game = generate_game((seed, goal, tetrominoes, initial_height_max))
-    solver = TetrisSolver(game.board, game.sequence, game.goal, max_attempts=max_attempts)
-    result, moves, failed_attempts = solver.solve()
+    if game is None:
+        return jsonify({'error': 'no game can be generated with these parameters'}), 400
+    # a split search answers differently from the sequential one, and a transposition table prunes positions and
+    # so changes the attempts and even the result, so neither uses nor fills the cache, whose key has no room for them
+    cacheable = not parallel and not transposition_table_size
+    cached = None
+    if cacheable:
+        with closing(ResultCache()) as cache:
+            cached = cache.lookup(seed, goal, tetrominoes, initial_height_max, strategy, max_attempts)
+    # a stored solution is only served if it still replays to the goal
+    if cached and cached[1] and not replay(game.board, game.sequence, unpack_moves(cached[3], game.sequence), game.goal).valid:
+        logging.warning(f"Cached solution for seed {seed} does not replay, solving it again")
+        cached = None
+    if parallel:
+        if not simulate_slots.acquire(blocking=False):
+            return jsonify({'error': 'too many simulations running, try again later'}), 503, {'Retry-After': '5'}
+        try:
+            result, moves, failed_attempts = solve_parallel(game.board, game.sequence, game.goal, max_attempts, strategy, transposition_table_size,
+                                                            executor=get_pool('simulate'), num_processes=simulate_workers, timeout=simulate_timeout,
+                                                            on_done=simulate_slots.release)
+        except concurrent.futures.TimeoutError:
+            return jsonify({'error': f'simulation did not finish within {simulate_timeout} seconds'}), 504
+        table_hits, table_misses = 0, 0
+        stats = None
+    elif cached:
+        seed, result, failed_attempts, packed_moves, seconds = cached
+        moves = unpack_moves(packed_moves, game.sequence)
+        table_hits, table_misses = 0, 0
+        stats = None
+    else:
+        if not simulate_slots.acquire(blocking=False):
+            return jsonify({'error': 'too many simulations running, try again later'}), 503, {'Retry-After': '5'}
+        future = get_pool('simulate').submit(simulate_seed, (seed, goal, tetrominoes, initial_height_max, max_attempts, transposition_table_size, strategy))
+        future.add_done_callback(lambda future: simulate_slots.release())
+        try:
+            result, moves, failed_attempts, table_hits, table_misses, stats, seconds = future.result(timeout=simulate_timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            return jsonify({'error': f'simulation did not finish within {simulate_timeout} seconds'}), 504
+        if cacheable:
+            with closing(ResultCache()) as cache:
+                cache.store([(seed, result, failed_attempts, pack_moves(moves), seconds)], goal, tetrominoes, initial_height_max, strategy, max_attempts)
+
+    if binary:
+        # one SolutionFile record, without the file header
+        return Response(pack_solution(seed, result, failed_attempts, game.board, game.sequence, pack_moves(moves)), mimetype='application/octet-stream')
 
     return jsonify({
         'result': result,
         'moves': moves,
         'failed_attempts': failed_attempts,
+        'table_hits': table_hits,
+        'table_misses': table_misses,
+        'cached': cached is not None,
+        'stats': stats,
         'board': game.visualize_board(),
         'sequence': game.sequence
     })
 
 if __name__ == "__main__":
+    # with the reloader on only the child process serves requests, so only it starts the workers
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        for kind in pool_sizes:
+            get_pool(kind)
     app.run(debug=True)
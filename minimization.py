@@ -1,26 +1,25 @@
+from bisect import bisect_right
+from itertools import accumulate
+
 def minimize_max_attempts(attempts):
+    # a budget of M solves every solvable seed that needed fewer than M failed attempts, at a cost of
+    # failed_attempts + 1 each, and spends all M on every other seed. With the costs sorted and summed up front each
+    # candidate budget is a bisect; the first budget in input order wins ties
     size = len(attempts)
+    costs = sorted(attempt["failed_attempts"] + 1 for attempt in attempts if attempt["solvable"])
+    cost_sums = [0, *accumulate(costs)]
     best_max_attempts = 0
     best_efficiency_ratio = 0
-    memo = {}
+    tried = set()
 
-    for i in range(size):
-        current_attempt_key = tuple(attempts[i].items())
-        if current_attempt_key in memo or not attempts[i]["solvable"]:
+    for attempt in attempts:
+        max_attempts = attempt["failed_attempts"] + 1
+        if not attempt["solvable"] or max_attempts in tried:
             continue
 
-        memo[current_attempt_key] = True
-
-        max_attempts = attempts[i]["failed_attempts"] + 1
-        solved = 0
-        loop = max_attempts * size
-
-        for j in range(max_attempts * size):
-            current_attempt = j // size + 1
-            isSolvable = True if attempts[j % size]["solvable"] and attempts[j % size]["failed_attempts"] + 1 == current_attempt else False
-            solved += 1 if isSolvable else 0
-            loop -= max_attempts - current_attempt if isSolvable else 0
-
+        tried.add(max_attempts)
+        solved = bisect_right(costs, max_attempts)
+        loop = cost_sums[solved] + max_attempts * (size - solved)
 
         efficiency_ratio = solved / loop
         if efficiency_ratio > best_efficiency_ratio:
@@ -29,9 +28,6 @@ def minimize_max_attempts(attempts):
 
     return best_max_attempts
 
-
-
-
 if __name__ == "__main__":
     example_attempts = [
         {"solvable": True, "failed_attempts": 0},
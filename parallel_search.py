@@ -0,0 +1,129 @@
+from TetrisSolver import TetrisSolver
+from contextlib import nullcontext
+import concurrent.futures
+import multiprocessing
+import threading
+
+_manager = None
+
+class CancellableSolver(TetrisSolver):
+    # polls the shared cancel event every check_every placements and, once it is set, drops the budget to zero,
+    # which every search loop already checks on its way out
+    check_every = 1024
+
+    def __init__(self, *args, cancel=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cancel = cancel
+        self.placed = 0
+
+    def place_tetromino(self, placement, row):
+        self.placed += 1
+        if self.placed % self.check_every == 0 and self.cancel.is_set():
+            self.max_attempts = 0
+        return super().place_tetromino(placement, row)
+
+def get_manager():
+    # the cancel events live in a manager process so they can be handed to the workers of any pool
+    global _manager
+    if _manager is None:
+        _manager = multiprocessing.Manager()
+    return _manager
+
+def solve_subtree(args):
+    board, pieces, goal, max_attempts, strategy, transposition_table_size, cancel = args
+    solver = CancellableSolver(board, pieces, goal, max_attempts=max_attempts, transposition_table_size=transposition_table_size,
+                               strategy=strategy, cancel=cancel)
+    result, moves, failed_attempts = solver.run()
+    return result, list(moves), failed_attempts
+
+def split(solver, count):
+    # expands the search level by level, in the order the depth-first search visits it, until there are at least
+    # count positions to hand out. A position is (board, column heights, lines cleared, index of its next piece,
+    # moves leading to it). Returns (frontier, winning moves or None, failed attempts spent on the way)
+    frontier = [(solver.board, solver.column_heights[:], 0, 0, [])]
+    failed_attempts = 0
+    while frontier and len(frontier) < count and all(index + 1 < len(solver.pieces) for _, _, _, index, _ in frontier):
+        expanded = []
+        for board, column_heights, lines, index, moves in frontier:
+            piece = solver.pieces[index]
+            for rotation, placements in enumerate(solver.placements[piece]):
+                solver.board, solver.column_heights, solver.lines_cleared = board, column_heights[:], lines
+                col = solver.evaluate_columns(placements)[0]
+                placement = placements[col]
+                if not solver.is_valid_move(placement, 0):
+                    failed_attempts += 1
+                    continue
+                solver.place_tetromino(placement, 0)
+                if solver.is_game_over():
+                    failed_attempts += 1
+                    continue
+                if solver.lines_cleared >= solver.goal:
+                    return [], moves + [(piece, rotation, col)], failed_attempts
+                expanded.append((solver.board, solver.column_heights, solver.lines_cleared, index + 1, moves + [(piece, rotation, col)]))
+        frontier = expanded
+    solver.reset()
+    return frontier, None, failed_attempts
+
+def when_all_done(futures, callback):
+    # calls callback once, from whichever thread sees the last of futures finish or be cancelled
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def finished(future):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            callback()
+
+    if not futures:
+        callback()
+    for future in futures:
+        future.add_done_callback(finished)
+
+def solve_parallel(board, sequence, goal, max_attempts=100000, strategy='dfs', transposition_table_size=0, executor=None, num_processes=None,
+                   subtrees=None, timeout=None, on_done=None):
+    # solves one game by handing the subtrees below its first few pieces to a process pool; the first subtree that
+    # is solved cancels the others. The workers share num_processes * max_attempts between them, so the search takes
+    # about as long as a sequential one with max_attempts, and a subtree never gets more than max_attempts: with no
+    # more subtrees than workers every subtree is searched as far as the sequential search could have gone.
+    # Returns (result, moves, failed_attempts) like TetrisSolver.run, but the attempts of subtrees that were
+    # cancelled are not counted and the moves are the first solution any worker finds, not necessarily the one the
+    # sequential search would find. Only the depth-first strategies are split, the others run as usual. After
+    # timeout seconds the workers are cancelled and concurrent.futures.TimeoutError is raised. A cancelled subtree
+    # only stops at its next check, so on_done, if given, is called once none of them is running any more, which
+    # can be after this returns
+    futures = {}
+    try:
+        solver = TetrisSolver(board, sequence, goal, max_attempts=max_attempts, transposition_table_size=transposition_table_size, strategy=strategy)
+        if strategy not in ('dfs', 'iterative'):
+            return solver.run()
+
+        num_processes = num_processes or multiprocessing.cpu_count()
+        frontier, moves, failed_attempts = split(solver, subtrees or num_processes)
+        if moves is not None:
+            return True, moves, failed_attempts
+        if not frontier or failed_attempts >= max_attempts:
+            return False, [], failed_attempts
+
+        share = max(1, min(max_attempts, (max_attempts - failed_attempts) * num_processes // len(frontier)))
+        cancel = get_manager().Event()
+        with (concurrent.futures.ProcessPoolExecutor(max_workers=num_processes) if executor is None else nullcontext(executor)) as pool:
+            for position_board, _, lines, index, prefix in frontier:
+                futures[pool.submit(solve_subtree, (solver.unpack_board(position_board), solver.pieces[index:], goal - lines, share, strategy,
+                                                    transposition_table_size, cancel))] = prefix
+            try:
+                for future in concurrent.futures.as_completed(futures, timeout=timeout):
+                    result, subtree_moves, subtree_attempts = future.result()
+                    failed_attempts += subtree_attempts
+                    if result:
+                        return True, futures[future] + subtree_moves, failed_attempts
+            finally:
+                cancel.set()
+                for future in futures:
+                    future.cancel()
+
+        return False, [], failed_attempts
+    finally:
+        if on_done is not None:
+            when_all_done(list(futures), on_done)
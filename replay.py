@@ -0,0 +1,83 @@
+from TetrisSolver import TetrisSolver
+from SolutionFile import SolutionFile, unpack_solution
+from collections import namedtuple
+from time import perf_counter
+import argparse
+import sys
+import threading
+
+Replay = namedtuple('Replay', ['valid', 'lines_cleared', 'board', 'first_illegal', 'reason'])
+
+_local = threading.local()
+
+def get_solver(height, width):
+    # one solver per board size and thread, reused for every replay on that thread: only its board, heights and line
+    # count are reset, so threads of a web server must not share it
+    if not hasattr(_local, 'solvers'):
+        _local.solvers = {}
+    if (height, width) not in _local.solvers:
+        _local.solvers[height, width] = TetrisSolver([[0] * width for _ in range(height)], [], 0)
+    return _local.solvers[height, width]
+
+def replay(board, sequence, moves, goal, height=20, width=10):
+    # plays the moves the way the solver does, each piece dropped from the top in its rotation and column, and
+    # checks that every move is legal and that the last one, and only the last one, reaches the goal. board is a
+    # list of rows or the solver's bitboard int. Returns a Replay with the final bitboard and, for an invalid
+    # solution, the index of the first illegal move (None if the moves are legal but fall short) and the reason
+    solver = get_solver(height, width)
+    solver.board = board if isinstance(board, int) else solver.pack_board(board)
+    solver.column_heights = solver.compute_column_heights()
+    solver.lines_cleared = 0
+
+    for index, (piece, rotation, col) in enumerate(moves):
+        if solver.lines_cleared >= goal:
+            return Replay(False, solver.lines_cleared, solver.board, index, 'move after the goal was reached')
+        if index >= len(sequence) or piece != sequence[index]:
+            return Replay(False, solver.lines_cleared, solver.board, index, 'piece does not follow the sequence')
+        rotations = solver.placements.get(piece)
+        if rotations is None or not 0 <= rotation < len(rotations) or not 0 <= col < len(rotations[rotation]):
+            return Replay(False, solver.lines_cleared, solver.board, index, 'no such rotation or column')
+
+        placement = rotations[rotation][col]
+        if not solver.is_valid_move(placement, 0):
+            return Replay(False, solver.lines_cleared, solver.board, index, 'blocked at the top')
+        solver.place_tetromino(placement, 0)
+        if solver.is_game_over():
+            return Replay(False, solver.lines_cleared, solver.board, index, 'tops out')
+
+    if solver.lines_cleared < goal:
+        return Replay(False, solver.lines_cleared, solver.board, None, 'goal not reached')
+    return Replay(True, solver.lines_cleared, solver.board, None, None)
+
+def audit_file(path):
+    # yields (seed, Replay) for every solved record of a SolutionFile
+    solutions = SolutionFile(path)
+    try:
+        for index in range(len(solutions)):
+            solution = unpack_solution(solutions.record(index), solutions.height, solutions.width, solutions.tetrominoes, packed_board=True)
+            if solution.solved:
+                yield solution.seed, replay(solution.board, solution.sequence, solution.moves, solutions.goal, solutions.height, solutions.width)
+    finally:
+        solutions.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that every solution in solution files reaches its goal.')
+    parser.add_argument('paths', nargs='+', help='files written by a sweep with records_path')
+    args = parser.parse_args()
+
+    invalid = 0
+    for path in args.paths:
+        start = perf_counter()
+        checked = 0
+        for seed, result in audit_file(path):
+            checked += 1
+            if not result.valid:
+                invalid += 1
+                move = f" at move {result.first_illegal}" if result.first_illegal is not None else ''
+                print(f"{path}: seed {seed} is invalid{move}: {result.reason} ({result.lines_cleared} lines)")
+        seconds = perf_counter() - start
+        print(f"{path}: {checked} solutions checked in {seconds:.2f} seconds ({checked / seconds if seconds else 0:.0f} per second)")
+    return 1 if invalid else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+from TetrisSolver import SolverStats, TetrisSolver, TranspositionTable
+from TetrisGameGenerator import TetrisGameGenerator
+from tetromino_table import get_placement_table
+from contextlib import closing, nullcontext
+from itertools import islice
+from time import time
+import concurrent.futures
+import multiprocessing
+import csv
+import json
+import logging
+import os
+import traceback
+
+# the checkpoint, result cache, solution file and budget search are only needed by the process driving a sweep and
+# are imported where they are used, so workers that load this module for solve_seeds start faster
+csv_header = ["seed", "max_moves", "goal", "initial_height_max"]
+_memos = {}
+
+def pack_moves(moves):
+    # one byte per move, rotation in the high nibble and column in the low one; the pieces are implied by the
+    # game's sequence, which the seed reproduces
+    return bytes(rotation << 4 | col for piece, rotation, col in moves)
+
+def unpack_moves(packed, sequence):
+    return [(piece, move >> 4, move & 15) for piece, move in zip(sequence, packed)]
+
+def get_memo(size):
+    # one memo per worker process, shared by every seed the process solves
+    if size not in _memos:
+        _memos[size] = TranspositionTable(size)
+    return _memos[size]
+
+def solve_seeds(args):
+    # a task is a list of seeds plus the sweep parameters; every seed comes back as a
+    # (seed, result, failed_attempts, packed moves, seconds) record, with a result of None if it raised. The
+    # records are returned with the task's SolverStats.as_dict(), or None when stats are not collected
+    seeds, goal, tetrominoes, initial_height_max, max_attempts, strategy, memo_size, collect_stats = args
+    memo = get_memo(memo_size) if memo_size else None
+    stats = SolverStats() if collect_stats else None
+    records = []
+    for seed in seeds:
+        try:
+            start_seed = time()
+            game = TetrisGameGenerator(seed=seed, goal=goal, tetrominoes=tetrominoes, initial_height_max=initial_height_max)
+            solver = TetrisSolver(game.board, game.sequence, game.goal, max_attempts=max_attempts, strategy=strategy, memo=memo, stats=stats)
+            result, moves, failed_attempts = solver.run()
+            records.append((seed, result, failed_attempts, pack_moves(moves), time() - start_seed))
+        except Exception as e:
+            logging.error(f"Error processing seed {seed}: {str(e)}")
+            logging.error(traceback.format_exc())
+            records.append((seed, None, 0, b'', 0.0))
+    return records, stats.as_dict() if stats else None
+
+def simulate_seed(args):
+    # a single game solved with the solver statistics and table counters /simulate reports
+    seed, goal, tetrominoes, initial_height_max, max_attempts, transposition_table_size, strategy = args
+    start_solve = time()
+    game = TetrisGameGenerator(seed=seed, goal=goal, tetrominoes=tetrominoes, initial_height_max=initial_height_max)
+    stats = SolverStats()
+    solver = TetrisSolver(game.board, game.sequence, game.goal, max_attempts=max_attempts,
+                          transposition_table_size=transposition_table_size, strategy=strategy, stats=stats)
+    result, moves, failed_attempts = solver.run()
+    table_hits, table_misses = solver.table_counters()
+    return result, moves, failed_attempts, table_hits, table_misses, stats.as_dict(), time() - start_solve
+
+def warm_up(_):
+    get_placement_table(10)
+    return os.getpid()
+
+def start_pool(num_processes=None):
+    # a process pool with its workers already started, for callers that keep one pool across many sweeps
+    num_processes = num_processes or multiprocessing.cpu_count()
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=num_processes)
+    list(executor.map(warm_up, range(num_processes)))
+    return executor
+
+def stream_results(start, end, goal, tetrominoes, initial_height_max, max_attempts, strategy='dfs', num_processes=None, window=None, chunksize=None,
+                   cache=None, memo_size=0, stats=None, executor=None):
+    # yields (seed, result, failed_attempts, packed moves, seconds) records in seed order. Seeds are handed out in
+    # tasks of chunksize and at most `window` tasks are submitted or waiting in the reorder buffer at any time, so
+    # memory does not grow with the size of the range. With a ResultCache, seeds it already answers are not solved
+    # again and new results are added to it. memo_size > 0 gives every worker a shared solver memo of that many states
+    # and the workers' search statistics are added to `stats` if it is a SolverStats. The seeds are solved on
+    # `executor` if one is given, otherwise on a pool of num_processes started for this call
+    num_processes = num_processes or multiprocessing.cpu_count()
+    window = window or num_processes * 4
+    if chunksize is None:
+        # same split as Pool.map, capped so progress and checkpoints stay fine grained
+        chunksize = min(max(1, -(-(end - start) // (num_processes * 4))), 64)
+    firsts = iter(range(start, end, chunksize))
+    pending = {}
+    finished = {}
+    next_first = start
+
+    with nullcontext(executor) if executor else concurrent.futures.ProcessPoolExecutor(max_workers=num_processes) as executor:
+        def submit(count):
+            for first in islice(firsts, count):
+                last = min(first + chunksize, end)
+                cached = cache.lookup_range(first, last, goal, tetrominoes, initial_height_max, strategy, max_attempts) if cache else {}
+                seeds = [seed for seed in range(first, last) if seed not in cached]
+                if seeds:
+                    pending[executor.submit(solve_seeds, (seeds, goal, tetrominoes, initial_height_max, max_attempts, strategy, memo_size, stats is not None))] = first, seeds, cached
+                else:
+                    finished[first] = [cached[seed] for seed in range(first, last)]
+
+        try:
+            submit(window)
+            while pending or finished:
+                if pending:
+                    done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        first, seeds, cached = pending.pop(future)
+                        try:
+                            records, task_stats = future.result()
+                            if task_stats:
+                                stats.merge(task_stats)
+                        except Exception as e:
+                            logging.error(f"Error processing seeds {seeds[0]}-{seeds[-1]}: {str(e)}")
+                            logging.error(traceback.format_exc())
+                            records = [(seed, None, 0, b'', 0.0) for seed in seeds]
+                        if [record[0] for record in records] != seeds:
+                            # an executor that mixed up its tasks; stopping keeps the wrong winners out of the csv and the
+                            # checkpoint, and a resumed sweep redoes the chunk
+                            raise RuntimeError(f"Results for seeds {seeds[0]}-{seeds[-1]} came back for other seeds")
+                        if cache:
+                            cache.store([record for record in records if record[1] is not None], goal, tetrominoes, initial_height_max, strategy, max_attempts)
+                        finished[first] = sorted(list(cached.values()) + records)
+
+                while next_first in finished:
+                    yield from finished.pop(next_first)
+                    next_first = min(next_first + chunksize, end)
+
+                submit(window - len(pending) - len(finished))
+        finally:
+            # a consumer that stops early only waits for the tasks that are already running
+            for future in pending:
+                future.cancel()
+
+def open_checkpoint(path):
+    import sqlite3
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE IF NOT EXISTS sweeps (params TEXT PRIMARY KEY, next_seed INTEGER, csv_offset INTEGER, total_games INTEGER, winnable_games INTEGER)')
+    connection.execute('CREATE TABLE IF NOT EXISTS chunks (params TEXT, chunk_start INTEGER, chunk_end INTEGER, winners TEXT, PRIMARY KEY (params, chunk_start))')
+    connection.execute('CREATE TABLE IF NOT EXISTS samples (params TEXT, seed INTEGER, solved INTEGER, failed_attempts INTEGER, PRIMARY KEY (params, seed))')
+    connection.execute('CREATE TABLE IF NOT EXISTS budgets (params TEXT PRIMARY KEY, max_attempts INTEGER)')
+    return connection
+
+def choose_budget(checkpoint, params, max_attempts):
+    # the budget with the most solved seeds per attempt over the sampled seeds, picked once per sweep so a resumed
+    # sweep keeps using it
+    from minimization import minimize_max_attempts
+    row = checkpoint.execute('SELECT max_attempts FROM budgets WHERE params = ?', (params,)).fetchone()
+    if row is not None:
+        return row[0]
+
+    samples = [{"solvable": bool(solved), "failed_attempts": failed_attempts}
+               for solved, failed_attempts in checkpoint.execute('SELECT solved, failed_attempts FROM samples WHERE params = ? ORDER BY seed', (params,))]
+    budget = min(minimize_max_attempts(samples) or max_attempts, max_attempts)
+    with checkpoint:
+        checkpoint.execute('INSERT INTO budgets VALUES (?, ?)', (params, budget))
+    logging.info(f"Adaptive budget: max_attempts {budget} chosen from {len(samples)} sampled seeds")
+    return budget
+
+def run_sweep(start, end, goal, tetrominoes, initial_height_max, max_attempts, strategy='dfs', num_processes=None,
+              path='winnable_games.csv', append=True, chunk_size=1000, checkpoint_path='checkpoint.sqlite', cache_path='results.sqlite',
+              memo_size=0, stats=None, adaptive_sample=0, progress=None, cancel=None, executor=None, records_path=None):
+    # the range is processed in chunks of chunk_size seeds. After each chunk its winners are appended to the csv and
+    # the checkpoint records them together with the csv length, so a sweep restarted with the same parameters cuts
+    # off any partially written chunk and carries on from the first unfinished one. Seeds are looked up in and added
+    # to the result cache at cache_path unless it is None. With adaptive_sample the first adaptive_sample seeds are
+    # solved with max_attempts and the rest with the budget minimize_max_attempts picks from their costs.
+    # progress(seed, result, total_games, winnable_games) is called after every seed, and once the threading.Event cancel is set
+    # the sweep stops after the last finished chunk, so it can be resumed later; progress is then called once more
+    # with the totals of the finished chunks only, as it is when a sweep resumes. With records_path every winner is
+    # also written to that SolutionFile with its board, sequence and moves. Returns (total_games, winnable_games) of
+    # the finished chunks
+    from ResultCache import ResultCache
+    from SolutionFile import SolutionWriter, pack_solution
+    params = json.dumps([start, end, goal, tetrominoes, initial_height_max, max_attempts, strategy, chunk_size, os.path.abspath(path)]
+                        + ([adaptive_sample] if adaptive_sample else []) + ([os.path.abspath(records_path)] if records_path else []))
+
+    with closing(open_checkpoint(checkpoint_path)) as checkpoint, (closing(ResultCache(cache_path)) if cache_path else nullcontext()) as cache:
+        row = checkpoint.execute('SELECT next_seed, csv_offset, total_games, winnable_games FROM sweeps WHERE params = ?', (params,)).fetchone()
+        resumed = row is not None
+        if row is None:
+            with open(path, 'a' if append else 'w', newline='') as file:
+                if file.tell() == 0:
+                    csv.writer(file).writerow(csv_header)
+                row = (start, file.tell(), 0, 0)
+            with checkpoint:
+                checkpoint.execute('INSERT INTO sweeps VALUES (?, ?, ?, ?, ?)', (params,) + row)
+        elif row[0] < end:
+            logging.info(f"Resuming sweep at seed {row[0]}")
+        next_seed, csv_offset, total_games, winnable_games = row
+        if resumed and progress:
+            progress(next_seed - 1, None, total_games, winnable_games)
+
+        def results():
+            first = next_seed
+            budget = max_attempts
+            if adaptive_sample:
+                sample_end = min(start + adaptive_sample, end)
+                for record in stream_results(first, sample_end, goal, tetrominoes, initial_height_max, max_attempts, strategy, num_processes,
+                                             cache=cache, memo_size=memo_size, stats=stats, executor=executor):
+                    # committed together with the chunk the seed belongs to
+                    checkpoint.execute('INSERT OR REPLACE INTO samples VALUES (?, ?, ?, ?)', (params, record[0], bool(record[1]), record[2]))
+                    yield record
+                first = max(first, sample_end)
+                budget = choose_budget(checkpoint, params, max_attempts)
+            yield from stream_results(first, end, goal, tetrominoes, initial_height_max, budget, strategy, num_processes,
+                                      cache=cache, memo_size=memo_size, stats=stats, executor=executor)
+
+        solution_writer = None
+        if records_path:
+            # the solution file holds this sweep's winners only, so a resumed sweep cuts it back to the committed ones
+            solution_writer = SolutionWriter(records_path, 20, 10, tetrominoes, goal, initial_height_max, winnable_games if resumed else None)
+        with open(path, 'r+', newline='') as file, (closing(solution_writer) if solution_writer else nullcontext()) as solutions:
+            file.truncate(csv_offset)
+            file.seek(csv_offset)
+            writer = csv.writer(file)
+            winners = []
+            solved = []
+            chunk_games = 0
+
+            for seed, result, failed_attempts, moves, seconds in results():
+                if cancel is not None and cancel.is_set():
+                    logging.info(f"Sweep cancelled at seed {seed}, {total_games} seeds are done")
+                    if progress:
+                        progress(seed, None, total_games, winnable_games)
+                    break
+                chunk_games += 1
+                if result:
+                    winners.append(seed)
+                    if solutions:
+                        solved.append((seed, failed_attempts, moves))
+                if progress:
+                    progress(seed, result, total_games + chunk_games, winnable_games + len(winners))
+                if (seed + 1 - start) % chunk_size and seed + 1 < end:
+                    continue
+
+                writer.writerows([[winner, tetrominoes, goal, initial_height_max] for winner in winners])
+                file.flush()
+                os.fsync(file.fileno())
+                if solutions:
+                    for winner, winner_attempts, winner_moves in solved:
+                        game = TetrisGameGenerator(seed=winner, goal=goal, tetrominoes=tetrominoes, initial_height_max=initial_height_max)
+                        solutions.write(pack_solution(winner, True, winner_attempts, game.board, game.sequence, winner_moves))
+                    solutions.flush()
+                    solved = []
+                total_games += chunk_games
+                winnable_games += len(winners)
+                chunk_start = seed - (seed - start) % chunk_size
+                with checkpoint:
+                    checkpoint.execute('INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?)', (params, chunk_start, seed + 1, json.dumps(winners)))
+                    checkpoint.execute('UPDATE sweeps SET next_seed = ?, csv_offset = ?, total_games = ?, winnable_games = ? WHERE params = ?',
+                                       (seed + 1, file.tell(), total_games, winnable_games, params))
+                winners = []
+                chunk_games = 0
+                logging.info(f"Processed {total_games} seeds, {winnable_games} winnable")
+
+    return total_games, winnable_games
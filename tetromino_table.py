@@ -0,0 +1,56 @@
+from typing import Dict, List, NamedTuple, Tuple
+
+tetromino_shapes: Dict[str, List[List[List[int]]]] = {
+    'I': [[[1, 1, 1, 1]], [[1], [1], [1], [1]]],
+    'J': [[[1, 0, 0], [1, 1, 1]], [[1, 1], [1, 0], [1, 0]], [[1, 1, 1], [0, 0, 1]], [[0, 1], [0, 1], [1, 1]]],
+    'L': [[[0, 0, 1], [1, 1, 1]], [[1, 0], [1, 0], [1, 1]], [[1, 1, 1], [1, 0, 0]], [[1, 1], [0, 1], [0, 1]]],
+    'O': [[[1, 1], [1, 1]]],
+    'S': [[[0, 1, 1], [1, 1, 0]], [[1, 0], [1, 1], [0, 1]]],
+    'T': [[[0, 1, 0], [1, 1, 1]], [[1, 0], [1, 1], [1, 0]], [[1, 1, 1], [0, 1, 0]], [[0, 1], [1, 1], [0, 1]]],
+    'Z': [[[1, 1, 0], [0, 1, 1]], [[0, 1], [1, 1], [1, 0]]]
+}
+tetrominoes_names: List[str] = ['I', 'J', 'L', 'O', 'S', 'T', 'Z']
+
+DEFAULT_WIDTH = 10
+
+
+class Placement(NamedTuple):
+    shape: List[List[int]]
+    col: int
+    width: int
+    height: int
+    cells: Tuple[Tuple[int, int], ...]
+    top: Tuple[int, ...]
+    bottom: Tuple[int, ...]
+    mask: int
+
+
+def build_placement_table(width: int = DEFAULT_WIDTH) -> Dict[str, List[List[Placement]]]:
+    # table[piece][rotation][col] describes the piece dropped with its left edge at col:
+    # cells are (row offset, board column), top[i] and bottom[i] are the row offsets of the highest and
+    # lowest cell in the piece's i-th column and mask is the
+    # bitboard of the piece at row 0 (row r lives in bits r * width ..)
+    table = {}
+    for name, rotations in tetromino_shapes.items():
+        table[name] = []
+        for shape in rotations:
+            rows, cols = len(shape), len(shape[0])
+            offsets = [(r, c) for r in range(rows) for c in range(cols) if shape[r][c] == 1]
+            top = tuple(min(r for r, c in offsets if c == i) for i in range(cols))
+            bottom = tuple(max(r for r, c in offsets if c == i) for i in range(cols))
+            mask = sum(1 << (r * width + c) for r, c in offsets)
+            table[name].append([
+                Placement(shape, col, cols, rows, tuple((r, col + c) for r, c in offsets), top, bottom, mask << col)
+                for col in range(width - cols + 1)
+            ])
+    return table
+
+
+placement_table = build_placement_table()
+_placement_tables = {DEFAULT_WIDTH: placement_table}
+
+
+def get_placement_table(width: int) -> Dict[str, List[List[Placement]]]:
+    if width not in _placement_tables:
+        _placement_tables[width] = build_placement_table(width)
+    return _placement_tables[width]